@@ -0,0 +1,38 @@
+"""Crash-safe file replacement: write a temp file, fsync it and rename it over the target"""
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="w", encoding='utf-8'):
+    """Open a temp file beside path; when the block succeeds it is fsynced and renamed over path
+
+    Readers see either the previous file or the complete new one, never a partial write,
+    and the new file survives a crash once the block has exited. If the block raises, the
+    temp file is removed and path is left as it was.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def fsync_directory(directory):
+    """Persist a rename within directory (POSIX only; Windows cannot open directories)"""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,87 @@
+import json
+import os
+
+from atomic_file import atomic_write
+
+
+class BallLog:
+    """Append-only per-match delivery log with a high-water mark per match and innings"""
+
+    def __init__(self, directory="ball_logs"):
+        self.directory = directory
+        self.marks_path = os.path.join(directory, "high_water.json")
+        self.marks = {}
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.marks_path):
+            try:
+                with open(self.marks_path, "r", encoding='utf-8') as f:
+                    self.marks = json.load(f)
+            except Exception as e:
+                print(f"Error loading ball log marks {self.marks_path}: {e}")
+
+    def log_path(self, match_id):
+        return os.path.join(self.directory, f"{match_id}.jsonl")
+
+    def high_water(self, match_id, innings_id):
+        """Highest ballNbr already ingested for this match and innings"""
+        return self.marks.get(f"{match_id}:{innings_id}", 0)
+
+    def ingest(self, match_id, data):
+        """Append deliveries newer than the high-water mark to the match log and return them in order"""
+        try:
+            commentary = data['commentary'][0]
+        except (KeyError, IndexError, TypeError):
+            return []
+
+        innings_id = commentary.get('inningsId', "")
+        mark = self.high_water(match_id, innings_id)
+
+        # One linear pass picks out the new deliveries; only those get sorted
+        new_balls = [ball for ball in commentary.get('commentaryList', []) if ball.get('ballNbr', 0) > mark]
+        if not new_balls:
+            return []
+        new_balls.sort(key=lambda x: x['ballNbr'])
+
+        try:
+            with open(self.log_path(match_id), "a", encoding='utf-8') as f:
+                for ball in new_balls:
+                    f.write(json.dumps({"inningsId": innings_id, **ball}, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Error appending to ball log for match {match_id}: {e}")
+            return []
+
+        # Saved with every append so a restart does not append these deliveries again
+        self.marks[f"{match_id}:{innings_id}"] = new_balls[-1]['ballNbr']
+        self.save()
+        print(f"Ingested {len(new_balls)} new deliveries for match {match_id}, innings {innings_id}")
+        return new_balls
+
+    def read(self, match_id):
+        """Return every logged delivery for a match in ingestion order
+
+        A crash between an append and saving the marks can log deliveries twice; only the
+        first copy of each innings and ballNbr is returned.
+        """
+        path = self.log_path(match_id)
+        if not os.path.exists(path):
+            return []
+        balls = []
+        seen = set()
+        with open(path, "r", encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                ball = json.loads(line)
+                key = (ball.get('inningsId'), ball.get('ballNbr'))
+                if key not in seen:
+                    seen.add(key)
+                    balls.append(ball)
+        return balls
+
+    def save(self):
+        """Write the high-water marks to disk"""
+        try:
+            with atomic_write(self.marks_path) as f:
+                json.dump(self.marks, f)
+        except Exception as e:
+            print(f"Error saving ball log marks {self.marks_path}: {e}")
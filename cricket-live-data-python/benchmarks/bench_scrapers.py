@@ -0,0 +1,255 @@
+"""Offline benchmark for the scrapers, replaying fixture pages through a local stand-in server
+
+Run from cricket-live-data-python:
+
+    python -m benchmarks.bench_scrapers --scales 1 10 100 1000 --json bench.json
+
+Each stage reports its best wall time over --repeat runs, pages per second and peak
+Python heap usage (tracemalloc, so memory held by lxml's C tree is not included).
+"""
+import argparse
+import contextlib
+import io
+import json
+import re
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from benchmarks import fixtures
+from full_commentary import InningsState, process_commentary_events, scrape_full_commentary
+from http_cache import ConditionalCache
+from http_client import create_session
+from matches_scorecard import parse_scorecard, scrape_matches, scrape_scorecard
+from parse_pool import ParsePool
+
+SCORECARD_PATH = re.compile(r"^/live-cricket-scorecard/(\d+)/")
+COMMENTARY_PATH = re.compile(r"^/api/mcenter/(\d+)/full-commentary/(\d+)$")
+NO_COMMENTARY = b'{"commentary": []}'
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the live-scores page, scorecard pages and commentary payloads of the current workload"""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs add ~40ms to some responses
+    disable_nagle_algorithm = True
+    workload = None
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # Streaming clients hang up once they have read what they need
+            pass
+
+    def do_GET(self):
+        body, content_type = self.route(urlsplit(self.path).path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self, path):
+        workload = self.workload
+        if path == "/cricket-match/live-scores":
+            return workload["live_scores"], "text/html; charset=utf-8"
+        match = SCORECARD_PATH.match(path)
+        if match:
+            return workload["scorecards"].get(int(match.group(1))), "text/html; charset=utf-8"
+        match = COMMENTARY_PATH.match(path)
+        if match:
+            # Each payload is a first innings; later innings have not started, like a live match
+            if int(match.group(2)) != 1:
+                return NO_COMMENTARY, "application/json"
+            return workload["commentary"].get(int(match.group(1))), "application/json"
+        return None, None
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalAdapter(HTTPAdapter):
+    """Transport adapter that sends every request to the local fixture server instead of its real host"""
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = self.base_url + parts.path + (f"?{parts.query}" if parts.query else "")
+        return super().send(request, **kwargs)
+
+
+def build_workload(samples, count):
+    """Encode every page and payload for a workload of count matches"""
+    matches = fixtures.scaled_matches(samples, count)
+    scorecard_samples = samples["scorecard"]
+    commentary_samples = samples["full_commentary"]
+    return {
+        "count": count,
+        "live_scores": fixtures.render_live_scores(matches).encode(),
+        "scorecards": {
+            fixtures.match_id(i): fixtures.render_scorecard(scorecard_samples[i % len(scorecard_samples)]).encode()
+            for i in range(count)
+        },
+        "commentary": {
+            fixtures.match_id(i): json.dumps(
+                fixtures.commentary_payload(commentary_samples[i % len(commentary_samples)], repeat=10)
+            ).encode()
+            for i in range(count)
+        }
+    }
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def local_session(server, pool_size):
+    session = create_session(pool_size=pool_size, retries=0)
+    adapter = LocalAdapter(f"http://127.0.0.1:{server.server_address[1]}",
+                           pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def stages(workload, session, workers, pool):
+    """(name, pages handled, callable) for every benchmarked stage"""
+    count = workload["count"]
+    scorecard_pages = list(workload["scorecards"].values())
+    commentary_payloads = list(workload["commentary"].values())
+    matches_data = []
+
+    def matches_stage():
+        matches_data[:] = scrape_matches(cache=ConditionalCache(path=None, limiter=None), session=session)
+        assert len(matches_data) == count, f"expected {count} matches, got {len(matches_data)}"
+
+    def matches_stream_stage():
+        streamed = scrape_matches(cache=ConditionalCache(path=None, limiter=None), session=session, stream=True)
+        assert len(streamed) == count, f"expected {count} matches, got {len(streamed)}"
+
+    def scorecard_stage():
+        # No pacing: the benchmark measures the pipeline, not the politeness policy
+        scrape_scorecard(matches_data, cache=ConditionalCache(path=None, limiter=None), session=session,
+                         max_workers=workers, per_host_limit=workers)
+
+    def scorecard_pool_stage():
+        scrape_scorecard(matches_data, cache=ConditionalCache(path=None, limiter=None), session=session,
+                         max_workers=workers, per_host_limit=workers, pool=pool)
+
+    def scorecard_parse_stage(backend):
+        def run():
+            for page in scorecard_pages:
+                parse_scorecard(page, {}, backend=backend)
+        return run
+
+    def commentary_stage(known_innings):
+        def run():
+            # Without a known innings every innings is probed, latest first; with one, only the
+            # next and current innings are
+            state = InningsState(path=None)
+            if known_innings:
+                for i in range(count):
+                    state.set(fixtures.match_id(i), known_innings)
+            scrape_full_commentary(cache=ConditionalCache(path=None, limiter=None), session=session,
+                                   state=state, matches_data=matches_data)
+        return run
+
+    def commentary_parse_stage():
+        for payload in commentary_payloads:
+            process_commentary_events(json.loads(payload))
+
+    return [
+        ("matches fetch+parse", 1, matches_stage),
+        ("matches stream+parse", 1, matches_stream_stage),
+        ("scorecard fetch+parse", count, scorecard_stage),
+        (f"scorecard fetch+pool({pool.workers})", count, scorecard_pool_stage),
+        ("scorecard parse", count, scorecard_parse_stage("bs4")),
+        ("scorecard parse (lxml)", count, scorecard_parse_stage("lxml")),
+        ("commentary fetch+parse", count, commentary_stage(None)),
+        ("commentary fetch (known)", count, commentary_stage(1)),
+        ("commentary parse", count, commentary_parse_stage)
+    ]
+
+
+def measure(run, repeat):
+    """Best wall time over repeat runs, then peak traced heap over one more run"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(scales, repeat=3, workers=8, parse_workers=None):
+    """Run every stage at every scale and return one result dict per stage and scale"""
+    samples = fixtures.load_samples()
+    server = start_server()
+    pool = ParsePool(parse_workers)
+    results = []
+    try:
+        for count in scales:
+            FixtureHandler.workload = build_workload(samples, count)
+            session = local_session(server, workers)
+            for name, pages, run in stages(FixtureHandler.workload, session, workers, pool):
+                seconds, peak = measure(run, repeat)
+                results.append({
+                    "stage": name,
+                    "matches": count,
+                    "seconds": round(seconds, 4),
+                    "pages_per_second": round(pages / seconds, 1) if seconds else None,
+                    "peak_mib": round(peak / (1024 * 1024), 2)
+                })
+                print(f"{name:<24}{count:>8}{seconds:>12.4f}{results[-1]['pages_per_second']:>14}"
+                      f"{results[-1]['peak_mib']:>12}")
+            session.close()
+    finally:
+        pool.close()
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against recorded fixtures")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--parse-workers", type=int, default=None, help="parse processes (default: CPU count)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    print(f"{'stage':<24}{'matches':>8}{'seconds':>12}{'pages/s':>14}{'peak MiB':>12}")
+    results = run_benchmarks(args.scales, repeat=args.repeat, workers=args.workers,
+                             parse_workers=args.parse_workers)
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
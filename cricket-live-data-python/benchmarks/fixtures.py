@@ -0,0 +1,158 @@
+"""Synthetic cricbuzz pages and API payloads built from the recorded JSON samples
+
+The samples in cricket-api/functions/data are scraper *output*, so the pages here are
+rendered back into the markup the scrapers select on. Scaling to N matches cycles
+through the samples and gives every copy its own match ID.
+"""
+import html
+import json
+import os
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "cricket-api", "functions", "data")
+
+EVENT_OUTCOMES = {"W": "WICKET", "6": "SIX", "4": "FOUR"}
+
+
+def load_samples():
+    """Load the recorded matches, scorecard and commentary samples"""
+    samples = {}
+    for name in ("matches", "scorecard", "full_commentary"):
+        with open(os.path.join(DATA_DIR, f"{name}.json"), "r", encoding='utf-8') as f:
+            samples[name] = json.load(f)
+    # Only matches with a scorecard link can be followed by the scorecard/commentary scrapers
+    samples["matches"] = [match for match in samples["matches"] if match["scorecard_links"]]
+    samples["full_commentary"] = [record for record in samples["full_commentary"] if record["events"]]
+    return samples
+
+
+def match_id(i):
+    return 200000 + i
+
+
+def scaled_matches(samples, count):
+    """count match records, each pointing at its own match ID"""
+    matches = []
+    for i in range(count):
+        match = json.loads(json.dumps(samples["matches"][i % len(samples["matches"])]))
+        for key in ("live_score", "scorecard_links", "commentary"):
+            parts = match[key].split("/")
+            parts[2] = str(match_id(i))
+            match[key] = "/".join(parts)
+        matches.append(match)
+    return matches
+
+
+def render_card(match):
+    e = html.escape
+    teams = match["teams"]
+    status_class = "cb-text-complete" if "won" in teams["match_status"].lower() else "cb-text-live"
+    links = "".join(
+        f'<a title="{title}" href="{e(match[key])}" class="cb-text-link">{title}</a>'
+        for title, key in (("Live Score", "live_score"), ("Scorecard", "scorecard_links"),
+                           ("Full Commentary", "commentary"))
+        if match[key]
+    )
+    return (
+        '<div class="cb-mtch-lst cb-col cb-col-100 cb-tms-itm">'
+        '<div class="cb-col-100 cb-col cb-schdl"><h3 class="cb-lv-scr-mtch-hdr inline-block">'
+        f'<a class="text-hvr-underline text-bold" href="{e(match["live_score"])}">{e(match["match"])}</a></h3>'
+        f'<span class="text-gray">{e(match["status"])}</span>'
+        f'<div class="text-gray">{e(match["date_stadium"])}</div></div>'
+        '<div class="cb-ovr-flo cb-hmscg-tm-nm"></div>'
+        f'<div class="cb-ovr-flo">{e(teams["team1"])}</div><div class="cb-ovr-flo">{e(teams["score1"])}</div>'
+        f'<div class="cb-ovr-flo">{e(teams["team2"])}</div><div class="cb-ovr-flo">{e(teams["score2"])}</div>'
+        f'<div class="{status_class}">{e(teams["match_status"])}</div>'
+        f'<nav class="cb-col-100 cb-col padt5">{links}</nav></div>'
+    )
+
+
+def render_live_scores(matches):
+    """Live-scores page with one card per match, wrapped in header, script and footer noise"""
+    cards = "".join(render_card(match) for match in matches)
+    return (
+        '<html><head><title>Live Cricket Scores</title><script>var cb = {};</script></head><body>'
+        '<div class="cb-nav-main">' + '<a href="#">nav</a>' * 50 + '</div>'
+        f'<div class="cb-col cb-col-100 cb-bg-white">{cards}</div>'
+        '<div class="cb-footer">' + '<p class="cb-ad">advertisement</p>' * 200 + '</div></body></html>'
+    )
+
+
+def render_innings(k, innings):
+    e = html.escape
+    rows = ""
+    for batter in innings["batters"]:
+        rows += (
+            '<div class="cb-col cb-col-100 cb-scrd-itms">'
+            f'<div class="cb-col cb-col-25 "><a class="cb-text-link">{e(batter["name"])}</a></div>'
+            f'<div class="cb-col cb-col-33"><span class="text-gray">{e(batter["status"])}</span></div>'
+            f'<div class="cb-col cb-col-8 text-right text-bold">{e(batter["runs"])}</div>'
+            + "".join(f'<div class="cb-col cb-col-8 text-right">{e(batter[key])}</div>'
+                      for key in ("balls", "4s", "6s", "strike_rate"))
+            + '</div>'
+        )
+    for label, css, value in (("Extras", "cb-text-black", innings["extras"]),
+                              ("Total", "text-black", innings["total"])):
+        if value:
+            runs, _, detail = value.partition("(")
+            rows += (
+                f'<div class="cb-col cb-col-100 cb-scrd-itms"><div class="cb-col cb-col-60">{label}</div>'
+                f'<div class="cb-col cb-col-8 text-bold {css} text-right">{e(runs)}</div>'
+                f'<div class="cb-col-32 cb-col">({e(detail)}</div></div>'
+            )
+    for players in innings["yet_to_bat"]:
+        rows += (
+            '<div class="cb-col cb-col-100 cb-scrd-itms"><div class="cb-col cb-col-27 ">Yet to Bat</div>'
+            f'<div class="cb-col cb-col-73 ">{e(players)}</div></div>'
+        )
+    wickets = "".join(f'<div class="cb-col cb-col-100 cb-col-rt cb-font-13"><span>{e(w)}</span></div>'
+                      for w in innings["fall_of_wickets"])
+    bowlers = ""
+    for bowler in innings["bowlers"]:
+        bowlers += (
+            '<div class="cb-col cb-col-100 cb-scrd-itms ">'
+            f'<div class="cb-col cb-col-38"><a class="cb-text-link">{e(bowler["bowler_name"])}</a></div>'
+            f'<div class="cb-col cb-col-8 text-right">{e(bowler["overs"])}</div>'
+            f'<div class="cb-col cb-col-8 text-right">{e(bowler["maiden"])}</div>'
+            f'<div class="cb-col cb-col-10 text-right">{e(bowler["runs"])}</div>'
+            f'<div class="cb-col cb-col-8 text-right text-bold">{e(bowler["wickets"])}</div>'
+            f'<div class="cb-col cb-col-8 text-right">{e(bowler["no_balls"])}</div>'
+            f'<div class="cb-col cb-col-8 text-right">{e(bowler["wide_balls"])}</div>'
+            f'<div class="cb-col cb-col-10 text-right">{e(bowler["economy"])}</div></div>'
+        )
+    return (
+        f'<div id="innings_{k}"><div class="cb-col cb-col-100 cb-ltst-wgt-hdr">'
+        f'<div class="cb-col cb-col-100 cb-scrd-hdr-rw"><span>{e(innings["innings_name"])}</span></div>{rows}</div>'
+        f'<div class="cb-col cb-col-100 cb-scrd-sub-hdr cb-bg-gray text-bold">Fall of Wickets</div>{wickets}'
+        f'<div class="cb-col cb-col-100 cb-ltst-wgt-hdr">{bowlers}</div></div>'
+    )
+
+
+def render_scorecard(record):
+    """Scorecard page for one scorecard.json record"""
+    innings = "".join(render_innings(k, inn) for k, inn in enumerate(record["innings"], 1))
+    return (
+        '<html><head><title>Scorecard</title></head><body>'
+        f'<h1 class="cb-nav-hdr cb-font-18 line-ht24">{html.escape(record["match"])}- Live Cricket Scorecard</h1>'
+        f'{innings}</body></html>'
+    )
+
+
+def commentary_payload(record, innings_id=1, repeat=1):
+    """Full-commentary API payload rebuilt from a full_commentary.json record, latest delivery first
+
+    repeat stretches the sample into a longer innings for scaled workloads.
+    """
+    events = record["events"] * repeat
+    commentary_list = []
+    for n, text in enumerate(events, 1):
+        outcome, _, comm_text = text.partition(", ")
+        commentary_list.append({
+            "ballNbr": n,
+            "overNumber": round((n - 1) // 6 + ((n - 1) % 6 + 1) / 10, 1),
+            "event": EVENT_OUTCOMES.get(outcome, "NONE"),
+            "totalRuns": int(outcome) if outcome.isdigit() else 0,
+            "commText": comm_text,
+            "inningsId": innings_id
+        })
+    commentary_list.reverse()
+    return {"commentary": [{"inningsId": innings_id, "commentaryList": commentary_list}]}
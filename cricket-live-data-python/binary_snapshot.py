@@ -0,0 +1,183 @@
+"""Compact binary snapshots with an offset index, read through mmap one record at a time
+
+Layout (little-endian):
+
+    header   magic b"CSNP", version u8, codec u8, 2 pad bytes, record count u32,
+             snapshot generation u64 (see snapshot_writer; 0 when written outside it)
+    index    per record: key offset u64, key length u32, body offset u64, body length u32
+    keys     UTF-8 record keys (the Cricbuzz match ID, see record_key), concatenated
+    bodies   encoded records, concatenated
+
+Records are keyed by match ID so that a matches.json entry finds its scorecard and
+commentary records; a record without an ID has an empty key and is only reachable by
+position. Bodies are MessagePack when msgpack is installed and compact JSON otherwise; the
+codec is recorded in the header. A reader maps the file, decodes only the header and index,
+and decodes a record's body when that record is asked for.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+
+from atomic_file import atomic_write
+from records import link_match_id
+
+try:
+    import msgpack
+except ImportError:  # optional: bodies fall back to compact JSON
+    msgpack = None
+
+MAGIC = b"CSNP"
+VERSION = 3
+HEADER = struct.Struct("<4sBBxxIQ")
+INDEX_ENTRY = struct.Struct("<QIQI")
+
+JSON_CODEC = 0
+MSGPACK_CODEC = 1
+CODEC_NAMES = {JSON_CODEC: "json", MSGPACK_CODEC: "msgpack"}
+
+
+def snapshot_path(path):
+    """Binary snapshot written next to a JSON snapshot, e.g. scorecard.json -> scorecard.snapshot"""
+    root, _ = os.path.splitext(path)
+    return f"{root}.snapshot"
+
+
+def record_key(record):
+    """Match ID of a matches.json, scorecard.json or full_commentary.json record as a string, empty if it has none"""
+    match_id = record.get("match_id") or link_match_id(record.get("scorecard_links"))
+    return str(match_id) if match_id else ""
+
+
+def encoder(codec):
+    if codec == MSGPACK_CODEC:
+        if msgpack is None:
+            raise ValueError("MessagePack snapshots need the msgpack package")
+        return msgpack.Packer(use_bin_type=True).pack
+    return lambda record: json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def decoder(codec):
+    if codec == MSGPACK_CODEC:
+        if msgpack is None:
+            raise ValueError("Snapshot bodies are MessagePack, which needs the msgpack package")
+        return lambda body: msgpack.unpackb(body, raw=False)
+    if codec == JSON_CODEC:
+        return json.loads
+    raise ValueError(f"Unknown snapshot codec {codec}")
+
+
+def write_snapshot(path, records, codec=None, generation=0):
+    """Write records (a JSON snapshot's list) as a binary snapshot of generation, replacing path atomically and durably
+
+    Raises ValueError if two records have the same match ID, which would make one of them
+    unreachable by key.
+    """
+    if codec is None:
+        codec = MSGPACK_CODEC if msgpack is not None else JSON_CODEC
+    keys = [record_key(record) for record in records]
+    seen = set()
+    for key in keys:
+        if key in seen:
+            raise ValueError(f"Duplicate match ID {key} in {path}")
+        if key:
+            seen.add(key)
+    encode = encoder(codec)
+    keys = [key.encode() for key in keys]
+    bodies = [encode(record) for record in records]
+
+    index = []
+    key_offset = HEADER.size + INDEX_ENTRY.size * len(records)
+    body_offset = key_offset + sum(len(key) for key in keys)
+    for key, body in zip(keys, bodies):
+        index.append(INDEX_ENTRY.pack(key_offset, len(key), body_offset, len(body)))
+        key_offset += len(key)
+        body_offset += len(body)
+
+    with atomic_write(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, codec, len(records), generation))
+        f.write(b"".join(index))
+        f.write(b"".join(keys))
+        f.write(b"".join(bodies))
+    return body_offset
+
+
+class SnapshotReader:
+    """Memory-mapped binary snapshot; records are decoded on access, by key or position"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, codec, count, generation = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} snapshot")
+            self.codec = codec
+            self.generation = generation
+            self.decode = decoder(codec)
+            self.entries = [
+                INDEX_ENTRY.unpack_from(self.map, HEADER.size + i * INDEX_ENTRY.size) for i in range(count)
+            ]
+            self.keys = [
+                self.map[key_offset:key_offset + key_length].decode()
+                for key_offset, key_length, _, _ in self.entries
+            ]
+            self.positions = {key: i for i, key in enumerate(self.keys) if key}
+            if len(self.positions) != len([key for key in self.keys if key]):
+                raise ValueError(f"{path} has duplicate keys")
+        except Exception:
+            self.map.close()
+            raise
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return str(key) in self.positions
+
+    def __iter__(self):
+        for i in range(len(self.entries)):
+            yield self.record(i)
+
+    def record(self, i):
+        """Decode the record at position i"""
+        _, _, body_offset, body_length = self.entries[i]
+        return self.decode(self.map[body_offset:body_offset + body_length])
+
+    def get(self, key, default=None):
+        """Decode the record for match ID key (int or str)"""
+        i = self.positions.get(str(key))
+        return default if i is None else self.record(i)
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    """Convert JSON snapshots to binary snapshots"""
+    parser = argparse.ArgumentParser(description="Write binary snapshots of JSON snapshot files")
+    parser.add_argument("paths", nargs="+", help="JSON snapshots, e.g. scorecard.json")
+    parser.add_argument("--codec", choices=sorted(CODEC_NAMES.values()), default=None,
+                        help="body encoding (default: msgpack when installed, else json)")
+    args = parser.parse_args()
+    codec = {name: codec for codec, name in CODEC_NAMES.items()}.get(args.codec)
+
+    for path in args.paths:
+        try:
+            with open(path, "r", encoding='utf-8') as f:
+                records = json.load(f)
+            size = write_snapshot(snapshot_path(path), records, codec)
+            print(f"Saved {len(records)} records to {snapshot_path(path)} ({size} bytes, was {os.path.getsize(path)})")
+        except Exception as e:
+            print(f"Error converting {path}: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import time
+
+from ball_log import BallLog
+from full_commentary import InningsState, load_previous_commentary, scrape_full_commentary
+from history_store import HistoryStore
+from html_backends import BACKENDS
+from http_cache import ConditionalCache
+from http_client import get_session
+from live_server import LiveFeed, LiveServer
+from metrics import metrics
+from matches_scorecard import scrape_matches, scrape_scorecard
+from parse_pool import ParsePool
+from rate_limit import rate_limiter
+from scheduler import MatchScheduler
+from scorecard_store import ScorecardStore
+from snapshot_writer import SnapshotWriter
+
+
+class ScraperDaemon:
+    """Long-running scraper keeping the HTTP pool, caches and per-match state warm between cycles"""
+
+    def __init__(self, interval=60, min_interval=10, backend="bs4", stream=False, parse_workers=0, serve=None,
+                 host="127.0.0.1", binary=False, store_interval=300):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.backend = backend
+        self.stream = stream
+        self.pool = ParsePool(parse_workers) if parse_workers else None
+        # Snapshots are written in the background; the cycle's metrics go out once they are on disk
+        self.writer = SnapshotWriter(binary=binary)
+        self.session = get_session()
+        self.cache = ConditionalCache(flights="http_flights")
+        self.state = InningsState()
+        self.ball_log = BallLog()
+        self.scheduler = MatchScheduler()
+        self.store = ScorecardStore()
+        self.store_interval = store_interval
+        self.store_saved = time.monotonic()
+        self.history = HistoryStore()
+        self.feed = LiveFeed() if serve is not None else None
+        self.server = LiveServer(self.feed, host, serve).start() if serve is not None else None
+        self.matches = []
+        self.scorecard = []
+        self.commentary = list(load_previous_commentary().values())
+        self.cycles = 0
+
+    def run_cycle(self):
+        """Scrape matches, scorecards and commentary once and write the snapshots"""
+        started = time.monotonic()
+        metrics.reset()
+        rate_limiter.new_cycle()
+        self.cycles += 1
+        print(f"Starting scrape cycle {self.cycles}...")
+
+        matches_data = scrape_matches(cache=self.cache, session=self.session, backend=self.backend,
+                                      stream=self.stream)
+        if not matches_data:
+            print("No matches data found, keeping the previous snapshot")
+            return
+        self.scheduler.update(matches_data)
+        with metrics.timer("history", table="matches"):
+            self.history.record_matches(matches_data)
+
+        # Typed records go to the history and the columnar store, so numbers are parsed once
+        scorecards = scrape_scorecard(matches_data, cache=self.cache, session=self.session,
+                                      scheduler=self.scheduler, backend=self.backend, pool=self.pool, typed=True)
+        with metrics.timer("history", table="scorecards"):
+            self.history.record_scorecards(matches_data, scorecards)
+        with metrics.timer("store", table="scorecard"):
+            self.store.update(scorecards)
+        scorecard_data = [record.to_dict() for record in scorecards]
+        previous = {record["match_id"]: record for record in self.commentary if record.get("match_id")}
+        commentary_data = scrape_full_commentary(cache=self.cache, session=self.session, state=self.state,
+                                                 ball_log=self.ball_log, scheduler=self.scheduler,
+                                                 matches_data=matches_data, previous=previous,
+                                                 history=self.history, live=self.feed)
+
+        self.matches, self.scorecard, self.commentary = matches_data, scorecard_data, commentary_data
+        if self.feed:
+            self.publish()
+        self.persist()
+        self.write_outputs()
+        print(f"Scrape cycle {self.cycles} finished in {time.monotonic() - started:.1f}s")
+
+    def write_outputs(self):
+        """Queue the three snapshots as one generation for the background writer
+
+        The cycle's metrics are snapshotted here and exported by the writer, since the next
+        cycle may have reset them by the time the set is on disk.
+        """
+        generation = self.writer.write_set({
+            "matches.json": self.matches,
+            "scorecard.json": self.scorecard,
+            "full_commentary.json": self.commentary
+        }, cycle_metrics=metrics.snapshot())
+        print(f"Queued snapshot generation {generation}")
+
+    def publish(self):
+        """Push the changes of this cycle to live clients"""
+        for kind, data in (("matches", self.matches), ("scorecard", self.scorecard),
+                           ("commentary", self.commentary)):
+            try:
+                with metrics.timer("publish", kind=kind):
+                    self.feed.publish(kind, data)
+            except Exception as e:
+                print(f"Error publishing {kind}: {e}")
+
+    def persist(self, final=False):
+        """Flush caches and per-match state so a restart resumes where this process left off
+
+        The scorecard store holds every match seen, so it is written at most every
+        store_interval seconds and on shutdown; live matches refill it after a crash.
+        """
+        self.cache.save()
+        self.state.save()
+        self.ball_log.save()
+        self.scheduler.save()
+        if self.store.dirty and (final or time.monotonic() - self.store_saved >= self.store_interval):
+            with metrics.timer("store_save"):
+                self.store.save()
+            self.store_saved = time.monotonic()
+
+    def seconds_until_next_cycle(self):
+        """Sleep until the earliest scheduled fetch, bounded by min_interval and interval"""
+        next_due = self.scheduler.next_due()
+        wait = self.interval if next_due is None else next_due - time.time()
+        return max(self.min_interval, min(self.interval, wait))
+
+    def run(self, max_cycles=None):
+        """Run scrape cycles until interrupted or max_cycles is reached"""
+        try:
+            while max_cycles is None or self.cycles < max_cycles:
+                try:
+                    self.run_cycle()
+                except Exception as e:
+                    print(f"Error in scrape cycle {self.cycles}: {e}")
+                if max_cycles is not None and self.cycles >= max_cycles:
+                    break
+                wait = self.seconds_until_next_cycle()
+                print(f"Next cycle in {wait:.0f} seconds...")
+                time.sleep(wait)
+        except KeyboardInterrupt:
+            print("Stopping scraper daemon...")
+        finally:
+            self.writer.close()
+            self.persist(final=True)
+            self.history.close()
+            if self.server:
+                self.server.close()
+            if self.pool:
+                self.pool.close()
+
+
+def main():
+    """Run the scraper as a long-lived process"""
+    parser = argparse.ArgumentParser(description="Scrape cricket data continuously")
+    parser.add_argument("--interval", type=float, default=60, help="maximum seconds between cycles")
+    parser.add_argument("--min-interval", type=float, default=10, help="minimum seconds between cycles")
+    parser.add_argument("--cycles", type=int, default=None, help="stop after this many cycles")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bs4", help="HTML parser backend")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream the live-scores page and stop reading after the match list")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="parse scorecard pages in this many worker processes (0 parses in-process)")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT",
+                        help="push live updates to Server-Sent Events clients on this port")
+    parser.add_argument("--host", default="127.0.0.1", help="address to serve live updates on")
+    parser.add_argument("--binary", action="store_true",
+                        help="also write memory-mappable binary snapshots (see binary_snapshot.py)")
+    args = parser.parse_args()
+
+    ScraperDaemon(interval=args.interval, min_interval=args.min_interval, backend=args.backend,
+                  stream=args.stream, parse_workers=args.parse_workers, serve=args.serve,
+                  host=args.host, binary=args.binary).run(max_cycles=args.cycles)
+
+if __name__ == "__main__":
+    main()
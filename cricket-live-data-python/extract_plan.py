@@ -0,0 +1,273 @@
+"""Field extraction for match cards and scorecard pages, shared by every HTML parser backend
+
+The functions here only touch the page through a tree adapter from html_backends:
+
+    walk(element)        -> (descendant, tag name, class list) for each descendant in document order
+    text(element)        -> the element's stripped text
+    find(element, name)  -> first descendant with that tag name, or None
+    attr(element, name)  -> attribute value, or None
+"""
+import re
+
+from records import Batter, Bowler, Innings, Match, Scorecard, Teams, link_match_id
+
+CARD_LINK_TITLES = ("Live Score", "Scorecard", "Full Commentary")
+CARD_STATUS_CLASSES = (("div", "cb-text-live"), ("div", "cb-text-complete"), ("span", "cb-text-preview"))
+
+# Innings parts by the classes they must carry, matched in one walk of the innings
+INNINGS_HEADER_ROW = frozenset({"cb-scrd-hdr-rw"})
+SCORECARD_ROW = frozenset({"cb-scrd-itms"})
+FALL_OF_WICKETS = frozenset({"cb-col", "cb-col-100", "cb-col-rt", "cb-font-13"})
+
+# Scorecard row cells by the classes they must carry: the first match in document order...
+ROW_CELLS = (
+    ("batter", frozenset({"cb-col-25"})),
+    ("status", frozenset({"cb-col-33"})),
+    ("runs", frozenset({"cb-col-8", "text-right", "text-bold"})),
+    ("extras", frozenset({"cb-col", "cb-col-8", "text-bold", "cb-text-black", "text-right"})),
+    ("total", frozenset({"cb-col", "cb-col-8", "text-bold", "text-black", "text-right"})),
+    ("division", frozenset({"cb-col-32", "cb-col"})),
+    ("bowler", frozenset({"cb-col-38"}))
+)
+# ...or every match, in document order
+ROW_CELL_LISTS = {
+    "cols_8": frozenset({"cb-col-8", "text-right"}),
+    "cols_10": frozenset({"cb-col-10", "text-right"}),
+    "yet_to_bat": frozenset({"cb-col-73", "cb-col"})
+}
+# Cells holding a player, whose name is the text of the cell's first link (None when it has none)
+LINK_CELLS = ("batter", "bowler")
+
+def parse_match_card(card, tree):
+    """Extract every field of a match card into a typed record in a single traversal"""
+    title = None
+    match_no = None
+    date_stadium = None
+    links = {}
+    statuses = {}
+    all_cb_ovr_flo = []
+
+    # Walk the card's tags once, keeping the first match for each field in document order
+    for tag, name, classes in tree.walk(card):
+        if name == "a":
+            if title is None and " ".join(classes) == "text-hvr-underline text-bold":
+                title = tag
+            link_title = tree.attr(tag, "title")
+            if link_title in CARD_LINK_TITLES and link_title not in links:
+                links[link_title] = tag
+        elif name == "span":
+            if match_no is None and "text-gray" in classes:
+                match_no = tag
+            if "cb-text-preview" in classes:
+                statuses.setdefault(("span", "cb-text-preview"), tag)
+        elif name == "div":
+            if date_stadium is None and "text-gray" in classes:
+                date_stadium = tag
+            if "cb-ovr-flo" in classes:
+                all_cb_ovr_flo.append(tag)
+            for status_class in ("cb-text-live", "cb-text-complete"):
+                if status_class in classes:
+                    statuses.setdefault(("div", status_class), tag)
+
+    # Match status logic: live beats complete beats preview, regardless of position
+    match_status = next((statuses[key] for key in CARD_STATUS_CLASSES if key in statuses), None)
+
+    def ovr_flo(i):
+        return tree.text(all_cb_ovr_flo[i]) if len(all_cb_ovr_flo) > i else ""
+
+    def link_url(link_title):
+        link = links.get(link_title)
+        return (tree.attr(link, "href") or "") if link is not None else ""
+
+    return Match(
+        match=tree.text(title) if title is not None else "",
+        status=re.sub(r'\&nbsp;\S*', '', tree.text(match_no)) if match_no is not None else "",
+        date_stadium=re.sub(r'\xa0\S*', '', tree.text(date_stadium)) if date_stadium is not None else "",
+        live_score=link_url("Live Score"),
+        scorecard_links=link_url("Scorecard"),
+        commentary=link_url("Full Commentary"),
+        teams=Teams(
+            team1=ovr_flo(1),
+            team2=ovr_flo(3),
+            score1=ovr_flo(2),
+            score2=ovr_flo(4),
+            match_status=tree.text(match_status) if match_status is not None else ""
+        )
+    )
+
+def classify_innings(innings_div, tree):
+    """Find the header, scorecard rows and fall-of-wickets entries of an innings in one walk"""
+    team_header = None
+    rows = []
+    wickets = []
+    for tag, _, classes in tree.walk(innings_div):
+        if not classes:
+            continue
+        classes = set(classes)
+        if team_header is None and INNINGS_HEADER_ROW <= classes:
+            team_header = tree.find(tag, "span")
+        if SCORECARD_ROW <= classes:
+            rows.append(tag)
+        if FALL_OF_WICKETS <= classes:
+            wickets.append(tag)
+    return team_header, rows, wickets
+
+def classify_row(row, tree):
+    """Text of every cell the field extractors need, from one pass over a scorecard row's tags"""
+    found = {}
+    lists = {name: [] for name in ROW_CELL_LISTS}
+    for tag, _, classes in tree.walk(row):
+        if not classes:
+            continue
+        classes = set(classes)
+        for name, required in ROW_CELLS:
+            if name not in found and required <= classes:
+                found[name] = tag
+        for name, required in ROW_CELL_LISTS.items():
+            if required <= classes:
+                lists[name].append(tag)
+
+    cells = {name: [tree.text(tag) for tag in tags] for name, tags in lists.items()}
+    for name, tag in found.items():
+        if name in LINK_CELLS:
+            link = tree.find(tag, "a")
+            cells[name] = tree.text(link) if link is not None else None
+        else:
+            cells[name] = tree.text(tag)
+    return cells
+
+def cell_text(cells, name, index=None):
+    """Text of a cell, or of the index-th cell of a list, or "" when it is missing"""
+    cell = cells.get(name)
+    if index is not None:
+        cell = cell[index] if len(cell) > index else None
+    return cell or ""
+
+def extract_batter(cells):
+    """Batter record for a row, or None when the row is not a batter"""
+    batter_name = cells.get("batter")
+    if batter_name is None:
+        return None
+
+    # Skip if it's an extras or total row
+    if batter_name in ["Extras", "Total"]:
+        return None
+
+    # Clean batter name (remove parentheses content)
+    clean_name = re.sub(r'\s*\([^)]*\)', '', batter_name).strip()
+
+    # text-right columns are runs, balls, 4s, 6s, SR
+    return Batter.from_dict({
+        "name": clean_name,
+        "status": cell_text(cells, "status"),
+        "runs": cell_text(cells, "runs"),
+        "balls": cell_text(cells, "cols_8", 1),
+        "4s": cell_text(cells, "cols_8", 2),
+        "6s": cell_text(cells, "cols_8", 3),
+        "strike_rate": cell_text(cells, "cols_8", 4)
+    })
+
+def extract_bowler(cells):
+    """Bowler record for a row, or None when the row is not a bowler"""
+    bowler_name = cells.get("bowler")
+    if bowler_name is None:
+        return None
+
+    # Skip if it's an extras or total row
+    if bowler_name in ["Extras", "Total"]:
+        return None
+
+    return Bowler.from_dict({
+        "bowler_name": bowler_name,
+        "overs": cell_text(cells, "cols_8", 0),
+        "maiden": cell_text(cells, "cols_8", 1),
+        "runs": cell_text(cells, "cols_10", 0),
+        "wickets": cell_text(cells, "cols_8", 2),
+        "no_balls": cell_text(cells, "cols_8", 3),
+        "wide_balls": cell_text(cells, "cols_8", 4),
+        "economy": cell_text(cells, "cols_10", 1)
+    })
+
+def extract_innings(innings_div, tree):
+    """Typed innings record for one innings section"""
+    team_header, rows, wickets = classify_innings(innings_div, tree)
+    innings_name = tree.text(team_header) if team_header is not None else "Unknown Team"
+
+    innings_data = {
+        "innings_name": innings_name,
+        "batters": [],
+        "extras": "",
+        "total": "",
+        "yet_to_bat": [],
+        "fall_of_wickets": [],
+        "bowlers": []
+    }
+    extras = None
+    total = None
+
+    # Classify each row once and dispatch it to every extractor it feeds
+    for item in rows:
+        try:
+            cells = classify_row(item, tree)
+
+            batter_data = extract_batter(cells)
+            if batter_data:
+                innings_data["batters"].append(batter_data)
+
+            # Extras and total come from the first row carrying them
+            if extras is None and "extras" in cells:
+                extras = cell_text(cells, "extras") + cell_text(cells, "division")
+            if total is None and "total" in cells:
+                total = cell_text(cells, "total") + cell_text(cells, "division")
+
+            for player_text in cells["yet_to_bat"]:
+                if player_text and player_text != "Yet to Bat":
+                    innings_data["yet_to_bat"].append(player_text)
+
+            bowler_data = extract_bowler(cells)
+            if bowler_data:
+                innings_data["bowlers"].append(bowler_data)
+        except Exception as e:
+            print(f"Error processing scorecard row: {e}")
+            continue
+
+    innings_data["extras"] = extras or ""
+    innings_data["total"] = total or ""
+
+    # Process fall of wickets
+    try:
+        for wicket in wickets:
+            wicket_text = tree.text(wicket)
+            if wicket_text:
+                innings_data["fall_of_wickets"].append(wicket_text)
+    except Exception as e:
+        print(f"Error processing fall of wickets: {e}")
+
+    return Innings(**innings_data)
+
+def extract_scorecard(page, match, tree):
+    """Extract the typed match record from a parsed scorecard page"""
+
+    # Create a new match object for each match
+    match_data = {
+        "match": "",
+        "innings": [],
+        "match_id": link_match_id(match.get("scorecard_links"))
+    }
+
+    # Get match name from page title or header
+    match_title = tree.scorecard_title(page)
+    if match_title is not None:
+        match_data["match"] = tree.text(match_title).split('-')[0]
+    else:
+        match_data["match"] = match.get("match", "Unknown Match")
+
+    for innings_div in tree.innings_sections(page):
+        try:
+            # Add this innings to the current match
+            match_data["innings"].append(extract_innings(innings_div, tree))
+        except Exception as e:
+            print(f"Error processing innings: {e}")
+            continue
+
+    return Scorecard(**match_data)
@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from http_client import get_session
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts of `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(max(capacity, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostLimiter:
+    """Per-host concurrency limit and token-bucket rate limit"""
+
+    def __init__(self, per_host_limit=4, rate=5.0, burst=None):
+        self.per_host_limit = per_host_limit
+        self.rate = rate
+        self.burst = burst if burst is not None else per_host_limit
+        self.semaphores = {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _for_host(self, host):
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.semaphores[host], self.buckets[host]
+
+    def run(self, url, fetch):
+        """Run fetch(url) once a concurrency slot and a rate token are free for its host"""
+        semaphore, bucket = self._for_host(urlsplit(url).netloc)
+        with semaphore:
+            bucket.acquire()
+            return fetch(url)
+
+
+def fetch_text(url):
+    """Default fetcher: blocking GET on the shared session returning the response body as text"""
+    return get_session().get(url).text
+
+
+def fetch_all(urls, fetch=fetch_text, max_workers=8, per_host_limit=4, rate=5.0, burst=None):
+    """Fetch all urls concurrently, yielding (index, url, body, error) as each one completes"""
+    if not urls:
+        return
+    limiter = HostLimiter(per_host_limit=per_host_limit, rate=rate, burst=burst)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as pool:
+        futures = {pool.submit(limiter.run, url, fetch): (i, url) for i, url in enumerate(urls)}
+        for future in as_completed(futures):
+            i, url = futures[future]
+            try:
+                yield i, url, future.result(), None
+            except Exception as e:
+                yield i, url, None, e
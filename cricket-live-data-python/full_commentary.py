@@ -1,158 +1,240 @@
 import re
+import heapq
+from urllib.parse import urlsplit
 import requests
 import json
-import time
 import os
 
-def get_innings_id(match_id):
-    """Get the correct innings ID by trying different innings numbers"""
-    innings = [4, 3, 2, 1]
-    innings_id = ""
+from atomic_file import atomic_write
+from ball_log import BallLog
+from history_store import HistoryStore
+from http_cache import ConditionalCache
+from http_client import COMMENTARY_HEADERS, get_session
+from metrics import metrics
+from rate_limit import HostBlocked, rate_limiter
+from scheduler import MatchScheduler
+from snapshot_writer import SnapshotWriter, read_consistent
+
+ALL_INNINGS = [4, 3, 2, 1]
+
+class InningsState:
+    """Last known innings ID per match, persisted between runs"""
+
+    def __init__(self, path="innings_state.json"):
+        self.path = path
+        self.innings = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding='utf-8') as f:
+                    self.innings = json.load(f)
+            except Exception as e:
+                print(f"Error loading innings state {path}: {e}")
+
+    def get(self, match_id):
+        return self.innings.get(str(match_id))
+
+    def set(self, match_id, innings_id):
+        self.innings[str(match_id)] = str(innings_id)
+
+    def save(self):
+        """Write the innings state to disk"""
+        if not self.path:
+            return
+        try:
+            with atomic_write(self.path) as f:
+                json.dump(self.innings, f)
+        except Exception as e:
+            print(f"Error saving innings state {self.path}: {e}")
+
+def probe_order(last_innings):
+    """Innings to probe, latest first: the next and current innings when known, then the rest"""
+    order = []
+    if last_innings:
+        last = int(last_innings)
+        order = [inning for inning in (last + 1, last) if inning in ALL_INNINGS]
+    return order + [inning for inning in ALL_INNINGS if inning not in order]
+
+def get_innings_id(match_id, session=None, cache=None, state=None):
+    """Get the correct innings ID, returning (innings_id, data) so the probe response can be reused"""
+    session = session or get_session()
+    cache = cache or ConditionalCache(path=None)
+    last_innings = state.get(match_id) if state else None
     
-    for inning in innings:
+    for inning in probe_order(last_innings):
         url = f"https://m.cricbuzz.com/api/mcenter/{match_id}/full-commentary/{inning}"
         print(f"Trying innings {inning}: {url}")
+        metrics.incr("innings_probes")
         
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json',
-                'Referer': 'https://m.cricbuzz.com/'
-            }
-            
-            r = requests.get(url, headers=headers, timeout=10)
-            if r.status_code == 200:
-                data = r.json()
-                commentary = data.get("commentary", [])
-                if len(commentary) == 0:
-                    print(f"No commentary found for innings {inning}")
-                else:
-                    innings_id = commentary[0].get("inningsId")
-                    if innings_id:
-                        print(f"Found innings_id: {innings_id}")
-                        return str(innings_id)
+            # A probe is never retried: the next innings is probed instead
+            r, unchanged = cache.get(url, session=session, headers=COMMENTARY_HEADERS, retries=0)
+            if unchanged:
+                data = cache.record(url)
+            elif r.status_code == 200:
+                with metrics.timer("parse", scraper="commentary", match=match_id):
+                    data = cache.parse(url, r, lambda response: response.json())
             else:
                 print(f"Status code {r.status_code} for innings {inning}")
+                continue
+
+            commentary = data.get("commentary", [])
+            if len(commentary) == 0:
+                print(f"No commentary found for innings {inning}")
+            else:
+                innings_id = commentary[0].get("inningsId")
+                if innings_id:
+                    print(f"Found innings_id: {innings_id}")
+                    if state:
+                        state.set(match_id, innings_id)
+                    # The probe already holds this innings' commentary unless it redirected elsewhere
+                    return str(innings_id), data if str(innings_id) == str(inning) else None
                 
+        except HostBlocked:
+            raise
         except Exception as e:
             print(f"Error trying innings {inning}: {e}")
             continue
     
     print("No valid innings found, using default '1'")
-    return "1"
+    return "1", None
 
-def get_commentary_data(match_id, innings_id):
-    """Get commentary data from API with retries"""
-    max_retries = 3
-    
-    for attempt in range(max_retries):
-        try:
-            url = f"https://m.cricbuzz.com/api/mcenter/{match_id}/full-commentary/{innings_id}"
-            print(f"Attempting API call (attempt {attempt + 1}): {url}")
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json',
-                'Referer': 'https://m.cricbuzz.com/'
-            }
-            
-            response = requests.get(url, timeout=15, headers=headers)
-            
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    print(f"Successfully got commentary data for match {match_id}")
-                    return data
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
-                        continue
-            else:
-                print(f"API request failed with status {response.status_code}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
-                    
-        except requests.exceptions.Timeout:
-            print(f"Request timeout on attempt {attempt + 1}")
-            if attempt < max_retries - 1:
-                time.sleep(3)
-                continue
-        except Exception as e:
-            print(f"Error fetching commentary data (attempt {attempt + 1}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
-                continue
-    
-    print(f"All {max_retries} attempts failed for match {match_id}")
+def get_commentary_data(match_id, innings_id, cache=None, session=None):
+    """Get commentary data from the API, reusing the cached data when unchanged
+
+    5xx responses are retried by the cache; any other failure waits for the next cycle.
+    """
+    cache = cache or ConditionalCache(path=None)
+    session = session or get_session()
+    url = f"https://m.cricbuzz.com/api/mcenter/{match_id}/full-commentary/{innings_id}"
+    print(f"Attempting API call: {url}")
+
+    try:
+        response, unchanged = cache.get(url, session=session, timeout=15, headers=COMMENTARY_HEADERS)
+        if unchanged:
+            print(f"Commentary unchanged for match {match_id}, reusing cached data")
+            return cache.record(url)
+
+        if response.status_code != 200:
+            print(f"API request failed with status {response.status_code}")
+            return None
+        with metrics.timer("parse", scraper="commentary", match=match_id):
+            data = cache.parse(url, response, lambda response: response.json())
+        print(f"Successfully got commentary data for match {match_id}")
+        return data
+
+    except requests.exceptions.Timeout:
+        print(f"Request timeout for match {match_id}")
+    except json.JSONDecodeError as e:
+        print(f"JSON decode error: {e}")
+        rate_limiter.record_error(urlsplit(url).netloc)
+    except Exception as e:
+        print(f"Error fetching commentary data for match {match_id}: {e}")
     return None
 
-def process_commentary_events(data):
-    """Process commentary data to extract events"""
+def latest_deliveries(commentary_list, n=12, events=None):
+    """Return the n latest deliveries, latest first, optionally keeping only the given event types
+
+    Uses a bounded heap over a single pass instead of sorting the whole list.
+    """
+    balls = (
+        ball for ball in commentary_list
+        if ball.get('ballNbr', 0) > 0 and (events is None or ball.get('event', "") in events)
+    )
+    return heapq.nlargest(n, balls, key=lambda x: x['ballNbr'])
+
+def format_delivery(ball):
+    """Format a delivery as "<outcome>, <commentary text>" """
+    # Get commentary text and clean it up
+    comm_text = ball.get("commText", "").strip()
+    
+    event = ball.get("event", "")
+    if event == "WICKET":
+        outcome = "W"
+    elif event == "SIX":
+        outcome = "6"
+    elif event == "FOUR":
+        outcome = "4"
+    else:
+        # Use totalRuns instead of legalRuns to include extras
+        outcome = str(ball.get("totalRuns", 0))
+    return f"{outcome}, {comm_text}" if comm_text else outcome
+
+def process_commentary_events(data, n=12, innings=None, events=None):
+    """Process commentary data to extract the latest n events, optionally for one innings and event types"""
     try:
         if not data or 'commentary' not in data:
             print("No commentary data found")
             return None, []
-            
-        commentary_list = data['commentary'][0]['commentaryList']
         
-        # Reverse sort by ballNbr to get latest deliveries first
-        balls = sorted(
-            [ball for ball in commentary_list if ball.get('ballNbr', 0) > 0],
-            key=lambda x: x['ballNbr'],
-            reverse=True
-        )
-
-        events = []
-        latest_over = None
-
-        for ball in balls:
-            # Capture the latest overNumber
-            if latest_over is None and 'overNumber' in ball:
-                latest_over = ball['overNumber']
-
-            # Get commentary text and clean it up
-            comm_text = ball.get("commText", "").strip()
+        commentary = data['commentary'][0]
+        if innings is not None:
+            commentary = next(
+                (block for block in data['commentary'] if str(block.get('inningsId')) == str(innings)),
+                None
+            )
+            if commentary is None:
+                print(f"No commentary found for innings {innings}")
+                return None, []
             
-            event = ball.get("event", "")
-            if event == "WICKET":
-                ball_info = f"W, {comm_text}" if comm_text else "W"
-                events.append(ball_info)
-            elif event == "SIX":
-                ball_info = f"6, {comm_text}" if comm_text else "6"
-                events.append(ball_info)
-            elif event == "FOUR":
-                ball_info = f"4, {comm_text}" if comm_text else "4"
-                events.append(ball_info)
-            else:
-                # Use totalRuns instead of legalRuns to include extras
-                total_runs = ball.get("totalRuns", 0)
-                ball_info = f"{total_runs}, {comm_text}" if comm_text else str(total_runs)
-                events.append(ball_info)
+        balls = latest_deliveries(commentary['commentaryList'], n=n, events=events)
 
-            if len(events) == 12:
-                break
+        # Capture the latest overNumber
+        latest_over = next((ball['overNumber'] for ball in balls if 'overNumber' in ball), None)
 
         # Reverse to chronological order
-        events.reverse()
-        
-        return latest_over, events
+        return latest_over, [format_delivery(ball) for ball in reversed(balls)]
         
     except Exception as e:
         print(f"Error processing commentary events: {e}")
         return None, []
 
-def scrape_full_commentary():
-    """Main function to scrape full commentary data"""
+def load_previous_commentary(path="full_commentary.json"):
+    """Previous commentary records keyed by match ID, reused for matches that are not due"""
+    if not os.path.exists(path):
+        return {}
     try:
-        # Load matches data
-        with open("matches.json", "r", encoding='utf-8') as f:
-            matches_data = json.load(f)
-        print(f"Loaded {len(matches_data)} matches from matches.json")
+        with open(path, "r", encoding='utf-8') as f:
+            return {record["match_id"]: record for record in json.load(f) if record.get("match_id")}
     except Exception as e:
-        print(f"Error loading matches.json: {e}")
-        return []
+        print(f"Error loading previous commentary {path}: {e}")
+        return {}
+
+def ingest_deliveries(match, match_id, data, ball_log=None, history=None, live=None):
+    """Append a payload's new deliveries to ball_log, push them to live and record them all in history"""
+    if ball_log:
+        new_balls = ball_log.ingest(match_id, data)
+        if live and new_balls:
+            innings_id = data['commentary'][0].get('inningsId', "")
+            live.publish_deliveries(match.get("match", "Unknown Match"), match_id, innings_id, new_balls)
+    if history:
+        with metrics.timer("history", table="deliveries", match=match_id):
+            history.record_deliveries(match_id, data)
+
+def scrape_full_commentary(cache=None, session=None, state=None, ball_log=None, window=12, scheduler=None,
+                           matches_data=None, previous=None, history=None, live=None):
+    """Main function to scrape full commentary data, appending new deliveries to ball_log when given
+
+    With a history store, every delivery of each payload is recorded there as well. With a
+    live feed, deliveries new to ball_log are pushed to it as soon as they are ingested.
+
+    matches_data and previous default to matches.json and full_commentary.json on disk. With a
+    scheduler, matches that are not due reuse their previous record.
+    """
+    if matches_data is None:
+        try:
+            # Load matches data
+            with open("matches.json", "r", encoding='utf-8') as f:
+                matches_data = json.load(f)
+            print(f"Loaded {len(matches_data)} matches from matches.json")
+        except Exception as e:
+            print(f"Error loading matches.json: {e}")
+            return []
+
+    if scheduler:
+        scheduler.update(matches_data)
+        if previous is None:
+            previous = load_previous_commentary()
+    previous = previous or {}
 
     full_commentary = []
     
@@ -193,39 +275,62 @@ def scrape_full_commentary():
             
             print(f"Extracted Match ID: {match_id}")
             
+            if scheduler and not scheduler.is_due(match, "commentary") and int(match_id) in previous:
+                print(f"Commentary not due ({scheduler.match_class(match)}), reusing previous record")
+                full_commentary.append(previous[int(match_id)])
+                continue
+            
             # Get the correct innings ID using the new logic
-            innings_id = get_innings_id(match_id)
+            last_innings = state.get(match_id) if state else None
+            innings_id, commentary_data = get_innings_id(match_id, session=session, cache=cache, state=state)
             print(f"Using innings ID: {innings_id}")
+
+            # The previous innings is never fetched again once a new one starts, so take the
+            # deliveries bowled after its last poll before moving on
+            if last_innings and state.get(match_id) != last_innings and (ball_log or history):
+                print(f"Innings moved from {last_innings} to {innings_id}, fetching the end of innings {last_innings}")
+                final_data = get_commentary_data(match_id, last_innings, cache=cache, session=session)
+                if final_data:
+                    ingest_deliveries(match, match_id, final_data, ball_log, history, live)
             
-            # Get commentary data
-            commentary_data = get_commentary_data(match_id, innings_id)
+            # Get commentary data unless the innings probe already returned it
+            if commentary_data is None:
+                commentary_data = get_commentary_data(match_id, innings_id, cache=cache, session=session)
             
             if commentary_data:
-                latest_over, events = process_commentary_events(commentary_data)
+                ingest_deliveries(match, match_id, commentary_data, ball_log, history, live)
+                with metrics.timer("extract", scraper="commentary", match=match_id):
+                    latest_over, events = process_commentary_events(commentary_data, n=window)
                 
                 match_commentary = {
                     "match": match.get("match", "Unknown Match"),
+                    "match_id": int(match_id),
                     "latest_over": latest_over if latest_over is not None else "",
                     "events": events if events else []
                 }
                 print(f"✅ Success: Latest over: {latest_over}, Events: {len(events)}")
+                # Like an empty scorecard, a payload without deliveries must not freeze the match
+                if scheduler and events:
+                    scheduler.mark_fetched(match, "commentary")
+                elif scheduler:
+                    scheduler.mark_failed(match, "commentary")
             else:
                 print("❌ No commentary data retrieved")
                 match_commentary = {
                     "match": match.get("match", "Unknown Match"),
+                    "match_id": int(match_id),
                     "latest_over": "",
                     "events": []
                 }
+                if scheduler:
+                    scheduler.mark_failed(match, "commentary")
             
             full_commentary.append(match_commentary)
             
-            # Add progressive delay between requests
-            delay = min(3 + (i * 0.5), 10)  # Increase delay progressively, max 10 seconds
-            print(f"Waiting {delay} seconds before next request...")
-            time.sleep(delay)
-            
         except Exception as e:
             print(f"❌ Error processing match {match.get('match', 'Unknown')}: {e}")
+            if scheduler:
+                scheduler.mark_failed(match, "commentary")
             full_commentary.append({
                 "match": match.get("match", "Unknown Match"),
                 "latest_over": "",
@@ -238,20 +343,35 @@ def scrape_full_commentary():
 def main():
     """Main function to scrape and save full commentary data"""
     print("Starting full commentary scraping...")
-    
-    full_commentary_data = scrape_full_commentary()
+    metrics.reset()
+    cache = ConditionalCache(flights="http_flights")
+    state = InningsState()
+    ball_log = BallLog()
+    scheduler = MatchScheduler()
+    history = HistoryStore()
+
+    # Commentary joins the snapshot generation of the matches.json it was built from
+    generation, snapshots = read_consistent(["matches.json"])
+    if generation is None:
+        print("matches.json is not part of a complete snapshot, starting a new generation")
+    full_commentary_data = scrape_full_commentary(cache=cache, state=state, ball_log=ball_log, scheduler=scheduler,
+                                                  matches_data=snapshots.get("matches.json"), history=history)
+    history.close()
+    cache.save()
+    state.save()
+    ball_log.save()
+    scheduler.save()
     
     if not full_commentary_data:
         print("No commentary data found")
+        metrics.write("metrics_commentary.json", "metrics_commentary.prom")
         return
     
-    # Save full commentary data
-    try:
-        with open("full_commentary.json", "w", encoding='utf-8') as f:
-            json.dump(full_commentary_data, f, indent=2, ensure_ascii=False)
-        print(f"Saved {len(full_commentary_data)} commentary records to full_commentary.json")
-    except Exception as e:
-        print(f"Error saving commentary data: {e}")
+    # Save full commentary data along with the changes since the last run
+    writer = SnapshotWriter()
+    writer.write_set({"full_commentary.json": full_commentary_data}, generation=generation)
+    writer.close()
+    metrics.write("metrics_commentary.json", "metrics_commentary.prom")
     
     print("Full commentary scraping completed!")
 
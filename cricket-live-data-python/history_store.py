@@ -0,0 +1,400 @@
+"""SQLite history of every scraped match, scorecard and delivery
+
+matches.json, scorecard.json and full_commentary.json only hold the latest snapshot. This
+store keeps every match seen with each change of its score line, the latest scorecard of
+each match, and every delivery of every innings, in one database file. The database runs
+in WAL mode so readers are never blocked by the scraper writing, and each batch of rows
+goes in with executemany inside a single transaction.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+
+from records import Batter, Bowler, Innings, Match, Scorecard
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    date_stadium TEXT NOT NULL,
+    scorecard_link TEXT NOT NULL,
+    team1 TEXT NOT NULL,
+    team2 TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+-- One row per change of a match's score line
+CREATE TABLE IF NOT EXISTS match_updates (
+    match_id INTEGER NOT NULL,
+    seen_at REAL NOT NULL,
+    score1 TEXT NOT NULL,
+    score2 TEXT NOT NULL,
+    match_status TEXT NOT NULL,
+    PRIMARY KEY (match_id, seen_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scorecards (
+    match_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    digest TEXT
+);
+-- Innings are numbered in the order they were played, 1 for the first
+CREATE TABLE IF NOT EXISTS innings (
+    match_id INTEGER NOT NULL,
+    innings INTEGER NOT NULL,
+    innings_name TEXT NOT NULL,
+    extras TEXT NOT NULL,
+    total TEXT NOT NULL,
+    extras_runs INTEGER,
+    total_runs INTEGER,
+    total_wickets INTEGER,
+    yet_to_bat TEXT NOT NULL,
+    fall_of_wickets TEXT NOT NULL,
+    PRIMARY KEY (match_id, innings)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS batting (
+    match_id INTEGER NOT NULL,
+    innings INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    runs INTEGER,
+    balls INTEGER,
+    fours INTEGER,
+    sixes INTEGER,
+    strike_rate REAL,
+    raw TEXT,
+    PRIMARY KEY (match_id, innings, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS bowling (
+    match_id INTEGER NOT NULL,
+    innings INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    bowler_name TEXT NOT NULL,
+    balls_bowled INTEGER,
+    maiden INTEGER,
+    runs INTEGER,
+    wickets INTEGER,
+    no_balls INTEGER,
+    wide_balls INTEGER,
+    economy REAL,
+    raw TEXT,
+    PRIMARY KEY (match_id, innings, position)
+) WITHOUT ROWID;
+-- Deliveries keep the whole API entry in data; the columns are there to be queried
+CREATE TABLE IF NOT EXISTS deliveries (
+    match_id INTEGER NOT NULL,
+    innings_id INTEGER NOT NULL,
+    ball_nbr INTEGER NOT NULL,
+    over_number REAL,
+    event TEXT,
+    total_runs INTEGER,
+    timestamp INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (match_id, innings_id, ball_nbr)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS batting_name ON batting (name);
+CREATE INDEX IF NOT EXISTS bowling_name ON bowling (bowler_name);
+CREATE INDEX IF NOT EXISTS deliveries_event ON deliveries (match_id, event);
+"""
+
+UPSERT_MATCH = """
+INSERT INTO matches (match_id, name, status, date_stadium, scorecard_link, team1, team2, first_seen, last_seen)
+VALUES (:match_id, :name, :status, :date_stadium, :scorecard_link, :team1, :team2, :seen_at, :seen_at)
+ON CONFLICT (match_id) DO UPDATE SET
+    name = excluded.name, status = excluded.status, date_stadium = excluded.date_stadium,
+    scorecard_link = excluded.scorecard_link, team1 = excluded.team1, team2 = excluded.team2,
+    last_seen = excluded.last_seen
+"""
+
+# Only inserted when the score line differs from the match's latest update
+INSERT_UPDATE = """
+INSERT INTO match_updates (match_id, seen_at, score1, score2, match_status)
+SELECT :match_id, :seen_at, :score1, :score2, :match_status
+WHERE NOT EXISTS (
+    SELECT 1 FROM (
+        SELECT score1, score2, match_status FROM match_updates
+        WHERE match_id = :match_id ORDER BY seen_at DESC LIMIT 1
+    ) WHERE score1 = :score1 AND score2 = :score2 AND match_status = :match_status
+)
+"""
+
+INSERT_SCORECARD = "INSERT OR REPLACE INTO scorecards (match_id, name, scraped_at, digest) VALUES (?, ?, ?, ?)"
+INSERT_INNINGS = "INSERT INTO innings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_BATTING = "INSERT INTO batting VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_BOWLING = "INSERT INTO bowling VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+# Entries already stored are rewritten only when the API changed them, e.g. an edited commText
+UPSERT_DELIVERY = """
+INSERT INTO deliveries (match_id, innings_id, ball_nbr, over_number, event, total_runs, timestamp, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (match_id, innings_id, ball_nbr) DO UPDATE SET
+    over_number = excluded.over_number, event = excluded.event, total_runs = excluded.total_runs,
+    timestamp = excluded.timestamp, data = excluded.data
+WHERE data != excluded.data
+"""
+
+
+# Matches joined to their latest score line
+MATCH_QUERY = """
+SELECT m.match_id, m.name, m.status, m.date_stadium, m.scorecard_link, m.team1, m.team2,
+       u.score1, u.score2, u.match_status
+FROM matches m LEFT JOIN match_updates u ON u.match_id = m.match_id
+    AND u.seen_at = (SELECT MAX(seen_at) FROM match_updates WHERE match_id = m.match_id)
+"""
+
+
+def match_summary(row):
+    match_id, name, status, date_stadium, scorecard_link, team1, team2, score1, score2, match_status = row
+    return match_id, {
+        "match": name,
+        "status": status,
+        "date_stadium": date_stadium,
+        "scorecard_links": scorecard_link,
+        "teams": {
+            "team1": team1,
+            "team2": team2,
+            "score1": score1 or "",
+            "score2": score2 or "",
+            "match_status": match_status or ""
+        }
+    }
+
+
+def raw_json(raw):
+    return json.dumps(raw, ensure_ascii=False) if raw else None
+
+
+def scorecard_digest(record):
+    """Content hash of a Scorecard, so unchanged scorecards are not rewritten"""
+    return hashlib.sha256(json.dumps(record.to_dict(), sort_keys=True).encode()).hexdigest()
+
+
+class HistoryStore:
+    """Matches, scorecards and deliveries of every scrape, in an SQLite database"""
+
+    def __init__(self, path="history.db", shared=False):
+        """shared lets other threads use the connection; they must not use it at the same time"""
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=not shared)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last transactions on power loss, never corruption
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # Databases created before scorecards carried a digest
+        if "digest" not in {row[1] for row in self.conn.execute("PRAGMA table_info(scorecards)")}:
+            self.conn.execute("ALTER TABLE scorecards ADD COLUMN digest TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def record_matches(self, matches_data, seen_at=None):
+        """Upsert every match with an ID and note the ones whose score line changed"""
+        seen_at = time.time() if seen_at is None else seen_at
+        rows = []
+        for data in matches_data:
+            match = data if isinstance(data, Match) else Match.from_dict(data)
+            if match.match_id is None:
+                continue
+            rows.append({
+                "match_id": match.match_id,
+                "name": match.match,
+                "status": match.status,
+                "date_stadium": match.date_stadium,
+                "scorecard_link": match.scorecard_links,
+                "team1": match.teams.team1,
+                "team2": match.teams.team2,
+                "score1": match.teams.score1,
+                "score2": match.teams.score2,
+                "match_status": match.teams.match_status,
+                "seen_at": seen_at
+            })
+        try:
+            with self.conn:
+                self.conn.executemany(UPSERT_MATCH, rows)
+                self.conn.executemany(INSERT_UPDATE, rows)
+        except sqlite3.Error as e:
+            print(f"Error recording matches in {self.path}: {e}")
+            return 0
+        return len(rows)
+
+    def record_scorecards(self, matches_data, scorecards, scraped_at=None):
+        """Replace the stored scorecard of each match whose latest scrape changed it
+
+        scorecards is scrape_scorecard's output for matches_data: one entry, in order, per
+        match with a scorecard link. Entries without innings (failed scrapes) keep whatever
+        was stored before, and so do entries identical to the stored scorecard, including
+        the cached records of matches that were not due; their scraped_at is left as it was.
+        Returns how many scorecards were written.
+        """
+        scraped_at = time.time() if scraped_at is None else scraped_at
+        matches = [data if isinstance(data, Match) else Match.from_dict(data) for data in matches_data]
+        jobs = [match for match in matches if match.scorecard_links]
+        records = {}
+        for match, scorecard in zip(jobs, scorecards):
+            match_id = match.match_id
+            record = scorecard if isinstance(scorecard, Scorecard) else Scorecard.from_dict(scorecard)
+            if match_id is not None and record.innings:
+                records[match_id] = record
+
+        digests = {match_id: scorecard_digest(record) for match_id, record in records.items()}
+        if digests:
+            stored = dict(self.conn.execute(
+                f"SELECT match_id, digest FROM scorecards WHERE match_id IN ({','.join('?' * len(digests))})",
+                list(digests)
+            ))
+            records = {match_id: record for match_id, record in records.items()
+                       if stored.get(match_id) != digests[match_id]}
+
+        scorecard_rows = [(match_id, record.match, scraped_at, digests[match_id])
+                          for match_id, record in records.items()]
+        innings_rows, batting_rows, bowling_rows = [], [], []
+        for match_id, record in records.items():
+            # The page lists the latest innings first
+            for number, innings in enumerate(reversed(record.innings), 1):
+                innings_rows.append((
+                    match_id, number, innings.innings_name, innings.extras, innings.total,
+                    innings.extras_runs, innings.total_runs, innings.total_wickets,
+                    json.dumps(innings.yet_to_bat, ensure_ascii=False),
+                    json.dumps(innings.fall_of_wickets, ensure_ascii=False)
+                ))
+                for position, batter in enumerate(innings.batters, 1):
+                    batting_rows.append((
+                        match_id, number, position, batter.name, batter.status, batter.runs, batter.balls,
+                        batter.fours, batter.sixes, batter.strike_rate, raw_json(batter.raw)
+                    ))
+                for position, bowler in enumerate(innings.bowlers, 1):
+                    bowling_rows.append((
+                        match_id, number, position, bowler.bowler_name, bowler.balls_bowled, bowler.maiden,
+                        bowler.runs, bowler.wickets, bowler.no_balls, bowler.wide_balls, bowler.economy,
+                        raw_json(bowler.raw)
+                    ))
+
+        try:
+            with self.conn:
+                stale = [(match_id,) for match_id in records]
+                for table in ("innings", "batting", "bowling"):
+                    self.conn.executemany(f"DELETE FROM {table} WHERE match_id = ?", stale)
+                self.conn.executemany(INSERT_SCORECARD, scorecard_rows)
+                self.conn.executemany(INSERT_INNINGS, innings_rows)
+                self.conn.executemany(INSERT_BATTING, batting_rows)
+                self.conn.executemany(INSERT_BOWLING, bowling_rows)
+        except sqlite3.Error as e:
+            print(f"Error recording scorecards in {self.path}: {e}")
+            return 0
+        return len(records)
+
+    def record_deliveries(self, match_id, data):
+        """Store every delivery of a full-commentary API payload, returning how many it held"""
+        rows = []
+        try:
+            for commentary in data.get("commentary", []):
+                innings_id = int(commentary.get("inningsId") or 0)
+                for ball in commentary.get("commentaryList", []):
+                    if ball.get("ballNbr", 0) <= 0:
+                        continue
+                    rows.append((
+                        int(match_id), innings_id, ball["ballNbr"], ball.get("overNumber"), ball.get("event"),
+                        ball.get("totalRuns"), ball.get("timestamp"), json.dumps(ball, ensure_ascii=False)
+                    ))
+        except (AttributeError, TypeError, ValueError) as e:
+            print(f"Error reading deliveries for match {match_id}: {e}")
+            return 0
+        try:
+            with self.conn:
+                self.conn.executemany(UPSERT_DELIVERY, rows)
+        except sqlite3.Error as e:
+            print(f"Error recording deliveries in {self.path}: {e}")
+            return 0
+        return len(rows)
+
+    def match(self, match_id):
+        """Stored match with its latest score line, or None"""
+        row = self.conn.execute(MATCH_QUERY + " WHERE m.match_id = ?", (match_id,)).fetchone()
+        return match_summary(row)[1] if row else None
+
+    def matches(self):
+        """(match ID, stored match with its latest score line) for every match, most recently seen first"""
+        rows = self.conn.execute(MATCH_QUERY + " ORDER BY m.last_seen DESC, m.match_id")
+        return [match_summary(row) for row in rows]
+
+    def match_updates(self, match_id, since=0):
+        """Every score line change of a match after since (epoch seconds), oldest first"""
+        rows = self.conn.execute(
+            "SELECT seen_at, score1, score2, match_status FROM match_updates "
+            "WHERE match_id = ? AND seen_at > ? ORDER BY seen_at", (match_id, since)
+        )
+        return [
+            {"seen_at": seen_at, "score1": score1, "score2": score2, "match_status": match_status}
+            for seen_at, score1, score2, match_status in rows
+        ]
+
+    def scorecard(self, match_id):
+        """Latest stored scorecard of a match as a scorecard.json record, or None"""
+        name = self.conn.execute("SELECT name FROM scorecards WHERE match_id = ?", (match_id,)).fetchone()
+        if name is None:
+            return None
+        innings_rows = self.conn.execute(
+            "SELECT innings, innings_name, extras, total, yet_to_bat, fall_of_wickets FROM innings "
+            "WHERE match_id = ? ORDER BY innings DESC", (match_id,)
+        ).fetchall()
+
+        batters, bowlers = {}, {}
+        for number, *fields, raw in self.conn.execute(
+                "SELECT innings, name, status, runs, balls, fours, sixes, strike_rate, raw FROM batting "
+                "WHERE match_id = ? ORDER BY innings, position", (match_id,)):
+            batters.setdefault(number, []).append(Batter(*fields, raw=json.loads(raw) if raw else None))
+        for number, *fields, raw in self.conn.execute(
+                "SELECT innings, bowler_name, balls_bowled, maiden, runs, wickets, no_balls, wide_balls, economy, "
+                "raw FROM bowling WHERE match_id = ? ORDER BY innings, position", (match_id,)):
+            bowlers.setdefault(number, []).append(Bowler(*fields, raw=json.loads(raw) if raw else None))
+
+        innings = [
+            Innings(innings_name, batters.get(number, []), extras, total, json.loads(yet_to_bat),
+                    json.loads(fall_of_wickets), bowlers.get(number, []))
+            for number, innings_name, extras, total, yet_to_bat, fall_of_wickets in innings_rows
+        ]
+        return Scorecard(name[0], innings, match_id).to_dict()
+
+    def scorecard_scraped_at(self, match_id):
+        """When the stored scorecard of a match was scraped, or None"""
+        row = self.conn.execute("SELECT scraped_at FROM scorecards WHERE match_id = ?", (match_id,)).fetchone()
+        return row[0] if row else None
+
+    def latest_ball(self, match_id):
+        """(innings_id, ball_nbr) of the latest stored delivery of a match, or None"""
+        return self.conn.execute(
+            "SELECT innings_id, ball_nbr FROM deliveries WHERE match_id = ? "
+            "ORDER BY innings_id DESC, ball_nbr DESC LIMIT 1", (match_id,)
+        ).fetchone()
+
+    def deliveries(self, match_id, innings_id=None, since=0):
+        """Stored API entries of a match's deliveries after ballNbr since, in ballNbr order"""
+        if innings_id is None:
+            rows = self.conn.execute(
+                "SELECT data FROM deliveries WHERE match_id = ? AND ball_nbr > ? ORDER BY innings_id, ball_nbr",
+                (match_id, since)
+            )
+        else:
+            rows = self.conn.execute(
+                "SELECT data FROM deliveries WHERE match_id = ? AND innings_id = ? AND ball_nbr > ? "
+                "ORDER BY ball_nbr", (match_id, innings_id, since)
+            )
+        return [json.loads(data) for data, in rows]
+
+    def latest_deliveries(self, match_id, n=12):
+        """Stored API entries of the n latest deliveries of a match's latest innings, latest first"""
+        rows = self.conn.execute(
+            "SELECT data FROM deliveries WHERE match_id = ? AND innings_id = "
+            "(SELECT MAX(innings_id) FROM deliveries WHERE match_id = ?) ORDER BY ball_nbr DESC LIMIT ?",
+            (match_id, match_id, n)
+        )
+        return [json.loads(data) for data, in rows]
+
+    def commentary_payload(self, match_id, innings_id):
+        """A full-commentary API payload rebuilt from the stored deliveries of one innings, latest first"""
+        balls = self.deliveries(match_id, innings_id)
+        balls.reverse()
+        return {"commentary": [{"inningsId": innings_id, "commentaryList": balls}]}
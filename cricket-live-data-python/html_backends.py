@@ -0,0 +1,175 @@
+"""HTML parser backends for the scrapers
+
+Both backends parse with libxml2 and expose the same small tree adapter to extract_plan,
+so they produce identical records:
+
+- "bs4" builds a BeautifulSoup tree and selects with precompiled soupsieve selectors
+- "lxml" works on lxml's own tree with precompiled XPath, skipping the Python object
+  tree BeautifulSoup builds on top of it
+"""
+import hashlib
+
+from bs4 import BeautifulSoup
+import soupsieve as sv
+from lxml import etree
+
+MATCHES_CONTAINER_CLASS = "cb-col cb-col-100 cb-bg-white"
+MATCH_CARD_CLASS = "cb-mtch-lst cb-col cb-col-100 cb-tms-itm"
+SCORECARD_TITLE_CLASSES = ("cb-nav-hdr", "cb-font-18", "line-ht24")
+
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class SoupTree:
+    """Tree adapter over BeautifulSoup"""
+    name = "bs4"
+
+    # Scorecard selectors, compiled once at import
+    SCORECARD_TITLE = sv.compile("." + ".".join(SCORECARD_TITLE_CLASSES))
+    INNINGS_SECTIONS = sv.compile('[id^="innings_"]')
+
+    def parse(self, source):
+        return BeautifulSoup(source, "lxml")
+
+    def match_cards(self, page):
+        """Match cards of the live-scores page, or None when the matches container is missing"""
+        container = page.find("div", class_=MATCHES_CONTAINER_CLASS)
+        if not container:
+            return None
+        return container.find_all("div", class_=MATCH_CARD_CLASS)
+
+    def scorecard_title(self, page):
+        return self.SCORECARD_TITLE.select_one(page)
+
+    def innings_sections(self, page):
+        return self.INNINGS_SECTIONS.select(page)
+
+    def walk(self, element):
+        for tag in element.find_all(True):
+            yield tag, tag.name, tag.get("class") or ()
+
+    def text(self, element):
+        return element.text.strip()
+
+    def find(self, element, name):
+        return element.find(name)
+
+    def attr(self, element, name):
+        return element.get(name)
+
+
+def has_class(name):
+    """XPath predicate matching an element carrying class name, as a CSS class selector does"""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+class LxmlTree:
+    """Tree adapter over lxml's native tree"""
+    name = "lxml"
+
+    # The class_ searches of the bs4 backend match the whole, whitespace-normalised class attribute
+    MATCHES_CONTAINER = etree.XPath(f'(//div[normalize-space(@class)="{MATCHES_CONTAINER_CLASS}"])[1]')
+    MATCH_CARDS = etree.XPath(f'.//div[normalize-space(@class)="{MATCH_CARD_CLASS}"]')
+    SCORECARD_TITLE = etree.XPath(f'(//*[{" and ".join(has_class(c) for c in SCORECARD_TITLE_CLASSES)}])[1]')
+    INNINGS_SECTIONS = etree.XPath('//*[starts-with(@id, "innings_")]')
+
+    # Plain etree parsers: lxml.html's element class lookup costs more than the extraction.
+    # Pages handed over as bytes are decoded as UTF-8, the encoding cricbuzz serves
+    PARSER = etree.HTMLParser()
+    UTF8_PARSER = etree.HTMLParser(encoding="utf-8")
+
+    # BeautifulSoup's .text leaves out script, style and template contents
+    HIDDEN_TAGS = ("script", "style", "template")
+
+    def parse(self, source):
+        page = etree.fromstring(source, self.UTF8_PARSER if isinstance(source, bytes) else self.PARSER)
+        if page is None:
+            # Empty document: extract from an empty page, as BeautifulSoup would
+            return etree.fromstring("<html></html>", self.PARSER)
+        etree.strip_elements(page, *self.HIDDEN_TAGS, with_tail=False)
+        return page
+
+    def match_cards(self, page):
+        """Match cards of the live-scores page, or None when the matches container is missing"""
+        container = self.MATCHES_CONTAINER(page)
+        if not container:
+            return None
+        return self.MATCH_CARDS(container[0])
+
+    def scorecard_title(self, page):
+        title = self.SCORECARD_TITLE(page)
+        return title[0] if title else None
+
+    def innings_sections(self, page):
+        return self.INNINGS_SECTIONS(page)
+
+    def stream_match_cards(self, response, chunk_size=STREAM_CHUNK_SIZE):
+        """Match cards read incrementally from a streamed live-scores response
+
+        Reading stops as soon as the matches container closes, so the footer is never
+        downloaded or parsed, and markup ending before the container is cleared as it
+        goes. Returns (cards or None when there is no container, sha256 of the bytes
+        read, number of bytes read).
+        """
+        parser = etree.HTMLPullParser(events=("start", "end"), encoding=response.encoding or "utf-8")
+        digest = hashlib.sha256()
+        size = 0
+        container = None
+        closed = False
+        chunks = response.iter_content(chunk_size)
+        try:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    if container is None:
+                        if event == "start" and element.tag == "div" and \
+                                " ".join((element.get("class") or "").split()) == MATCHES_CONTAINER_CLASS:
+                            container = element
+                        elif event == "end":
+                            element.clear(keep_tail=True)
+                    elif event == "end" and element is container:
+                        closed = True
+                        break
+                if closed:
+                    break
+            if not closed:
+                parser.close()
+            elif getattr(response.raw, "length_remaining", None) == 0:
+                # The whole body had already arrived: finish it so the connection goes back to the pool
+                for _ in chunks:
+                    pass
+        finally:
+            response.close()
+
+        if container is None:
+            return None, digest.hexdigest(), size
+        etree.strip_elements(container, *self.HIDDEN_TAGS, with_tail=False)
+        return self.MATCH_CARDS(container), digest.hexdigest(), size
+
+    def walk(self, element):
+        # Elements only: comments and processing instructions are not tags to BeautifulSoup either
+        for tag in element.iterdescendants(etree.Element):
+            classes = tag.get("class")
+            yield tag, tag.tag, classes.split() if classes else ()
+
+    def text(self, element):
+        return "".join(element.itertext()).strip()
+
+    def find(self, element, name):
+        return next(element.iterdescendants(name), None)
+
+    def attr(self, element, name):
+        return element.get(name)
+
+
+BACKENDS = {tree.name: tree for tree in (SoupTree(), LxmlTree())}
+
+
+def get_backend(name):
+    """Tree adapter for a backend name"""
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown HTML backend {name!r}, expected one of {sorted(BACKENDS)}")
@@ -0,0 +1,426 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from atomic_file import atomic_write
+from http_client import get_session
+from metrics import metrics
+from rate_limit import HostBlocked, rate_limiter
+
+try:
+    import fcntl
+except ImportError:  # Windows: requests are only coalesced within a process
+    fcntl = None
+
+
+# Responses retried by ConditionalCache, each attempt paced by the rate limiter
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class SingleFlight:
+    """Runs one call per key at a time; callers arriving while it runs wait for it and share its outcome"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        """Return (fn's result, whether it was shared from a call already in flight)"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Future()
+        if not leader:
+            return call.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+        finally:
+            with self.lock:
+                del self.calls[key]
+        return result, False
+
+
+class ProcessFlight:
+    """Coalesces identical requests across processes through lock files in directory
+
+    SingleFlight only joins threads sharing one ConditionalCache. Separate processes, such
+    as the daemon and a one-shot scraper run, or two overlapping cron runs, meet here: the
+    process holding a request's lock fetches it, and a process that had to wait for the
+    lock takes the response left beside it instead of sending its own request. Waiters
+    leave a marker before blocking, and the response is only written to disk when one did.
+    Without fcntl every call simply runs.
+    """
+
+    def __init__(self, directory="http_flights", max_age=60):
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def paths(self, key):
+        name = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+        base = os.path.join(self.directory, name)
+        return base + ".lock", base + ".response", base + ".waiting"
+
+    def do(self, key, fetch):
+        """Return (fetch()'s response, False), or (the response another process fetched while this one waited, True)"""
+        if fcntl is None:
+            return fetch(), False
+        lock_path, response_path, waiting_path = self.paths(key)
+        waited_from = time.time()
+        lock = self.lock(lock_path, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if lock is None:
+            open(waiting_path, "a").close()
+            lock = self.lock(lock_path, fcntl.LOCK_EX)
+            response = load_response(response_path, waited_from)
+            if response is not None:
+                lock.close()
+                return response, True
+        with lock:
+            # Tells prune() the lock is in use; opening it does not touch its mtime
+            os.utime(lock_path)
+            response = fetch()
+            if 200 <= response.status_code < 300 and claim(waiting_path):
+                try:
+                    save_response(response_path, response)
+                except OSError as e:
+                    print(f"Error sharing response for {response.url}: {e}")
+            return response, False
+
+    def lock(self, path, flags):
+        """Open and flock path, or return None if flags has LOCK_NB and the lock is held
+
+        Retries when prune() unlinked the file between opening and locking it, so every
+        holder locks the file currently at path.
+        """
+        while True:
+            f = open(path, "a")
+            try:
+                fcntl.flock(f, flags)
+            except BlockingIOError:
+                f.close()
+                return None
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    def prune(self):
+        """Remove files older than max_age; lock files only while no process holds them"""
+        if fcntl is None:
+            return
+        cutoff = time.time() - self.max_age
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if not entry.name.endswith(".lock"):
+                    os.remove(entry.path)
+                    continue
+                lock = self.lock(entry.path, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if lock is not None:
+                    with lock:
+                        if os.stat(entry.path).st_mtime < cutoff:
+                            os.remove(entry.path)
+        except OSError as e:
+            print(f"Error pruning {self.directory}: {e}")
+
+
+def claim(path):
+    """Remove the marker at path, returning whether it was there"""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def save_response(path, response):
+    data = {
+        "written_at": time.time(),
+        "url": response.url,
+        "status": response.status_code,
+        "headers": dict(response.headers),
+        "encoding": response.encoding,
+        "content": base64.b64encode(response.content).decode()
+    }
+    with atomic_write(path) as f:
+        json.dump(data, f)
+
+
+def load_response(path, since):
+    """Response saved at path no earlier than since, or None"""
+    try:
+        with open(path, "r", encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data["written_at"] < since:
+        return None
+    response = Response()
+    response.url = data["url"]
+    response.status_code = data["status"]
+    response.headers = CaseInsensitiveDict(data["headers"])
+    response.encoding = data["encoding"]
+    response._content = base64.b64decode(data["content"])
+    return response
+
+
+class ConditionalCache:
+    """Per-URL ETag/Last-Modified validators, body hash and last parsed record, persisted between runs
+
+    Requests are paced through `limiter` (the shared adaptive rate limiter by default; None
+    disables pacing), and 5xx responses are retried up to `retries` times, each attempt
+    waiting out the backoff the limiter imposed after the last one. This is the only retry
+    layer; once the limiter defers a host, the last response is returned without waiting.
+
+    Concurrent identical requests, and parses of the same body, from threads sharing this
+    cache are coalesced: one round trip and one parse serve every caller waiting on them.
+    With a `flights` directory, identical requests from other processes using the same
+    directory share one round trip too (see ProcessFlight).
+
+    At most max_entries URLs are kept; the least recently used ones are evicted, so probed
+    innings and finished matches drop out instead of growing the saved file for good.
+    """
+
+    def __init__(self, path="http_cache.json", limiter=rate_limiter, max_entries=500, retries=2, flights=None):
+        self.path = path
+        self.limiter = limiter
+        self.retries = retries
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.process_flights = ProcessFlight(flights) if flights else None
+        self.load()
+
+    def load(self):
+        """Load cached entries from disk, starting empty if the file is missing or corrupt"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding='utf-8') as f:
+                self.entries = json.load(f)
+            self.evict()
+            print(f"Loaded {len(self.entries)} cached pages from {self.path}")
+        except Exception as e:
+            print(f"Error loading HTTP cache {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Write cached entries to disk"""
+        if self.process_flights:
+            self.process_flights.prune()
+        if not self.path:
+            return
+        try:
+            with self.lock:
+                data = json.dumps(self.entries, ensure_ascii=False)
+            with atomic_write(self.path) as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Error saving HTTP cache {self.path}: {e}")
+
+    def get(self, url, session=None, stream=False, retries=None, **kwargs):
+        """Conditionally GET url, returning (response, unchanged)
+
+        unchanged is True when the server answered 304 or the body hashes the same as
+        the last stored one; the caller should then reuse record(url) instead of parsing.
+        With stream=True a 200 is returned with its body unread, so the body check is left
+        to the caller: it hashes what it reads and asks same_body(). retries overrides the
+        cache's 5xx retry count for this request.
+
+        A request for a url that is already being fetched with the same headers, by this
+        process or (with flights) another one, waits for that fetch and gets its response
+        too. Streamed requests are never shared, since their body can only be read once.
+        """
+        if stream:
+            return self.fetch(url, session, stream, retries, **kwargs)
+        key = (url, tuple(sorted((kwargs.get("headers") or {}).items())))
+        result, shared = self.flights.do(key, lambda: self.fetch(url, session, stream, retries, **kwargs))
+        if shared:
+            metrics.incr("coalesced", host=urlsplit(url).netloc, kind="fetch")
+        return result
+
+    def fetch(self, url, session, stream, retries=None, **kwargs):
+        """get() without coalescing"""
+        with self.lock:
+            entry = self.touch(url)
+        caller_headers = kwargs.pop("headers", None) or {}
+        headers = dict(caller_headers)
+        if entry and "record" in entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        host = urlsplit(url).netloc
+        retries = self.retries if retries is None else retries
+        request = lambda: self.request(url, host, session, stream, headers, retries, **kwargs)
+        if self.process_flights and not stream:
+            # Keyed without the validators, which are this process's own
+            key = (url, tuple(sorted(caller_headers.items())))
+            response, shared = self.process_flights.do(key, request)
+            if shared:
+                metrics.incr("coalesced", host=host, kind="process")
+        else:
+            response = request()
+
+        if not entry or "record" not in entry:
+            metrics.incr("cache_misses", host=host)
+            return response, False
+        if response.status_code == 304:
+            metrics.incr("cache_hits", host=host, kind="not_modified")
+            return response, True
+        if stream:
+            return response, False
+        return response, self.same_body(url, response, body_hash(response.content))
+
+    def request(self, url, host, session, stream, headers, retries, **kwargs):
+        """GET url through the rate limiter, retrying 5xx responses while the host is not deferred"""
+        response = None
+        for attempt in range(retries + 1):
+            if self.limiter:
+                try:
+                    self.limiter.acquire(host)
+                except HostBlocked as e:
+                    if response is None:
+                        raise
+                    print(f"Not retrying {url}: {e}")
+                    return response
+            if response is not None:
+                print(f"Status code {response.status_code} for {url}, retrying")
+                metrics.incr("retries", host=host, status=response.status_code)
+                response.close()
+            try:
+                with metrics.timer("fetch", host=host):
+                    response = (session or get_session()).get(url, headers=headers, stream=stream, **kwargs)
+            except Exception as e:
+                metrics.incr("fetch_errors", host=host, error=type(e).__name__)
+                if self.limiter:
+                    self.limiter.record_error(host)
+                raise
+            if self.limiter:
+                self.limiter.record(host, response.status_code, response.headers.get("Retry-After"))
+            metrics.incr("http_responses", host=host, status=response.status_code)
+            if not stream:
+                metrics.incr("bytes_transferred", len(response.content), host=host)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+
+    def parse(self, url, response, parse, keep=None):
+        """Record parsed from a 200 response by parse(response), stored for url and returned
+
+        Callers parsing the same body of url at the same time share one parse, and a body
+        already stored is not parsed again. Exceptions from parse reach every waiting caller.
+        When keep is given, only records for which keep(record) is true are stored.
+        """
+        digest = body_hash(response.content)
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry and "record" in entry and entry.get("hash") == digest:
+                metrics.incr("coalesced", host=urlsplit(url).netloc, kind="parse")
+                return entry["record"]
+
+        def run():
+            record = parse(response)
+            if keep is None or keep(record):
+                self.store(url, response, record, digest=digest)
+            return record
+
+        record, shared = self.flights.do(("parse", url, digest), run)
+        if shared:
+            metrics.incr("coalesced", host=urlsplit(url).netloc, kind="parse")
+        return record
+
+    def same_body(self, url, response, digest):
+        """Whether a body hashing to digest is the one stored for url, counting the hit or miss
+
+        On a hit the stored validators are refreshed from response. Returns False without
+        counting when url has no stored record; get() has already counted that miss.
+        """
+        host = urlsplit(url).netloc
+        with self.lock:
+            entry = self.entries.get(url)
+            if not entry or "record" not in entry:
+                return False
+            same = response.status_code == 200 and entry.get("hash") == digest
+            if same:
+                entry.update(validators(response))
+        if same:
+            metrics.incr("cache_hits", host=host, kind="same_body")
+        else:
+            metrics.incr("cache_misses", host=host)
+        return same
+
+    def has_record(self, url):
+        with self.lock:
+            return "record" in self.entries.get(url, {})
+
+    def record(self, url):
+        """Return the last parsed record stored for url"""
+        with self.lock:
+            self.touch(url)
+            return self.entries[url]["record"]
+
+    def store(self, url, response, record, digest=None):
+        """Remember the validators and body hash of response along with its parsed record
+
+        digest is the body hash for a streamed response, whose content was not kept.
+        Records parsed from error responses (anything but 2xx) are never stored, so a
+        throttled or failed page cannot stand in for the real one later.
+        """
+        if not 200 <= response.status_code < 300:
+            print(f"Not caching {url}: status {response.status_code}")
+            return
+        entry = validators(response)
+        entry["hash"] = digest or body_hash(response.content)
+        entry["record"] = record
+        with self.lock:
+            self.entries.pop(url, None)
+            self.entries[url] = entry
+            self.evict()
+
+    def touch(self, url):
+        """Entry for url moved to the most recently used end, or None; call with the lock held"""
+        entry = self.entries.pop(url, None)
+        if entry is not None:
+            self.entries[url] = entry
+        return entry
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries; call with the lock held
+
+        Entries are kept in use order, oldest first, which the saved JSON preserves.
+        """
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+
+
+def body_hash(content):
+    """Content hash used to detect unchanged bodies when the server sends no validators"""
+    return hashlib.sha256(content or b"").hexdigest()
+
+
+def validators(response):
+    """Extract the cache validators from a response"""
+    return {
+        "etag": response.headers.get("ETag", ""),
+        "last_modified": response.headers.get("Last-Modified", "")
+    }
@@ -0,0 +1,68 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': 'gzip, deflate'
+}
+
+COMMENTARY_HEADERS = {
+    'Accept': 'application/json',
+    'Referer': 'https://m.cricbuzz.com/'
+}
+
+_shared_session = None
+_shared_lock = threading.Lock()
+
+
+class ScraperSession(requests.Session):
+    """requests.Session with a default timeout applied to every request"""
+
+    def __init__(self, timeout=10):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(pool_size=16, retries=2, backoff_factor=0.5, timeout=10, headers=None, status_retries=0):
+    """Create a keep-alive session with a per-host connection pool, default headers and retry policy
+
+    retries covers connection and read errors. 5xx responses are only retried here when
+    status_retries is set: urllib3 would back off on its own clock and sleep out any
+    Retry-After, out of sight of the adaptive rate limiter, so by default they are returned
+    and ConditionalCache retries them through the limiter instead.
+    """
+    session = ScraperSession(timeout=timeout)
+    retry = Retry(
+        total=retries + status_retries,
+        connect=retries,
+        read=retries,
+        status=status_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def get_session():
+    """Return the process-wide session shared by all scrapers, creating it on first use"""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
@@ -0,0 +1,196 @@
+"""Server-Sent Events feed of the scraper's live state
+
+Clients open GET /events and receive:
+
+    event: snapshot   {"matches": [...], "scorecard": [...], "commentary": [...]} on connect
+    event: patch      {"kind": ..., "match": <match key>, "ops": [...]} per changed match and cycle
+    event: delivery   {"match": ..., "match_id": ..., "innings_id": ..., "latest_over": ...,
+                       "deliveries": [...]} as soon as new deliveries are ingested
+
+Patch ops are snapshot_diff ops against the kind's snapshot. Every event is serialized
+once and the same bytes are written to every client. Event IDs let a reconnecting client
+(Last-Event-ID) replay what it missed from a bounded backlog, or get a fresh snapshot when
+that is gone. GET /snapshot returns the current snapshot as plain JSON.
+"""
+import json
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from full_commentary import format_delivery
+from snapshot_diff import diff_snapshots
+
+KINDS = ("matches", "scorecard", "commentary")
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+
+
+def event_frame(event_id, event, data):
+    """One encoded SSE event; compact JSON never contains a raw newline"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+
+class LiveFeed:
+    """Latest snapshots plus a bounded backlog of encoded events, shared by every client"""
+
+    def __init__(self, backlog=1000):
+        self.cond = threading.Condition()
+        self.events = deque(maxlen=backlog)
+        self.last_id = 0
+        self.snapshots = {kind: [] for kind in KINDS}
+        self.snapshot_frame = None
+        self.closed = False
+
+    def push(self, event, data):
+        """Append an event to the backlog; the caller holds the lock"""
+        self.last_id += 1
+        self.events.append((self.last_id, event_frame(self.last_id, event, data)))
+
+    def publish(self, kind, data):
+        """Replace the snapshot of kind, sending one patch event per match that changed"""
+        ops = diff_snapshots(self.snapshots[kind], data)
+        groups = {}
+        for op in ops:
+            groups.setdefault(op["path"][0] if op["path"] else None, []).append(op)
+        with self.cond:
+            self.snapshots[kind] = data
+            self.snapshot_frame = None
+            for key, group in groups.items():
+                self.push("patch", {"kind": kind, "match": key, "ops": group})
+            if groups:
+                self.cond.notify_all()
+        return len(groups)
+
+    def publish_deliveries(self, match, match_id, innings_id, balls):
+        """Send newly ingested deliveries (in ballNbr order) of one match right away"""
+        if not balls:
+            return
+        deliveries = [
+            {"ballNbr": ball.get("ballNbr"), "overNumber": ball.get("overNumber"), "text": format_delivery(ball)}
+            for ball in balls
+        ]
+        latest_over = next((ball["overNumber"] for ball in reversed(balls) if "overNumber" in ball), None)
+        with self.cond:
+            self.push("delivery", {
+                "match": match,
+                "match_id": match_id,
+                "innings_id": innings_id,
+                "latest_over": latest_over,
+                "deliveries": deliveries
+            })
+            self.cond.notify_all()
+
+    def snapshot(self):
+        """Encoded snapshot event at the current event ID, built once per change"""
+        with self.cond:
+            if self.snapshot_frame is None:
+                self.snapshot_frame = event_frame(self.last_id, "snapshot", self.snapshots)
+            return self.last_id, self.snapshot_frame
+
+    def frames_after(self, last_id, timeout=KEEPALIVE_SECONDS):
+        """Wait for events after last_id, returning (frames, new last ID), or (None, last_id) once closed
+
+        A client whose last ID is no longer in the backlog (or is from before a restart)
+        gets a snapshot instead of the missing events.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.closed or self.last_id != last_id, timeout)
+            if self.closed:
+                return None, last_id
+            if self.last_id == last_id:
+                return [], last_id
+            if last_id > self.last_id or not self.events or self.events[0][0] > last_id + 1:
+                event_id, frame = self.snapshot()
+                return [frame], event_id
+            # IDs are consecutive, so the missed events are the tail of the backlog
+            missed = self.last_id - last_id
+            return [frame for _, frame in list(self.events)[-missed:]], self.last_id
+
+    def close(self):
+        """End every open stream"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class LiveHandler(BaseHTTPRequestHandler):
+    """Serves /events and /snapshot from the feed"""
+    feed = None
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/events":
+            self.stream(parts)
+        elif parts.path == "/snapshot":
+            self.send_snapshot()
+        else:
+            self.send_error(404)
+
+    def send_common_headers(self, content_type):
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", "no-cache")
+        # The browser extension connects from its own origin
+        self.send_header("Access-Control-Allow-Origin", "*")
+
+    def send_snapshot(self):
+        with self.feed.cond:
+            body = json.dumps(self.feed.snapshots, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_common_headers("application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream(self, parts):
+        last_event_id = self.headers.get("Last-Event-ID") or parse_qs(parts.query).get("last_event_id", [None])[0]
+        self.send_response(200)
+        self.send_common_headers("text/event-stream; charset=utf-8")
+        self.end_headers()
+        try:
+            self.wfile.write(f"retry: {RETRY_MILLISECONDS}\n\n".encode())
+            if last_event_id and last_event_id.isdigit():
+                last_id = int(last_event_id)
+            else:
+                last_id, frame = self.feed.snapshot()
+                self.wfile.write(frame)
+            self.wfile.flush()
+            while True:
+                frames, last_id = self.feed.frames_after(last_id)
+                if frames is None:
+                    break
+                self.wfile.write(b"".join(frames) if frames else b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LiveServer:
+    """SSE server for a LiveFeed, running on a background thread"""
+
+    def __init__(self, feed, host="127.0.0.1", port=8765):
+        self.feed = feed
+        handler = type("FeedHandler", (LiveHandler,), {"feed": feed})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.address[:2]
+        print(f"Serving live updates on http://{host}:{port}/events")
+        return self
+
+    def close(self):
+        self.feed.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
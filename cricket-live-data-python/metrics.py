@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from atomic_file import atomic_write
+
+# Labels kept in the JSON snapshot but summed away in the Prometheus export to bound cardinality
+PROMETHEUS_DROP_LABELS = ("match",)
+
+
+def label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """Thread-safe stage timers and counters for one scrape cycle"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new cycle"""
+        with self.lock:
+            self.started = time.time()
+            self.timers = {}
+            self.counters = {}
+
+    def observe(self, stage, seconds, **labels):
+        """Record one timing for stage"""
+        key = (stage, label_key(labels))
+        with self.lock:
+            timer = self.timers.setdefault(key, {"count": 0, "sum": 0.0, "max": 0.0})
+            timer["count"] += 1
+            timer["sum"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """Time the enclosed block as stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+
+    def incr(self, name, value=1, **labels):
+        """Add value to counter name"""
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def merge(self, snapshot):
+        """Fold a snapshot taken elsewhere, e.g. in a parse worker process, into this cycle"""
+        with self.lock:
+            for entry in snapshot["timers"]:
+                key = (entry["stage"], label_key(entry["labels"]))
+                timer = self.timers.setdefault(key, {"count": 0, "sum": 0.0, "max": 0.0})
+                timer["count"] += entry["count"]
+                timer["sum"] += entry["sum"]
+                timer["max"] = max(timer["max"], entry["max"])
+            for entry in snapshot["counters"]:
+                key = (entry["name"], label_key(entry["labels"]))
+                self.counters[key] = self.counters.get(key, 0) + entry["value"]
+
+    def snapshot(self):
+        """Metrics for the current cycle as a JSON-friendly dict"""
+        with self.lock:
+            return {
+                "started": self.started,
+                "duration": time.time() - self.started,
+                "timers": [
+                    {"stage": stage, "labels": dict(labels), **timer}
+                    for (stage, labels), timer in sorted(self.timers.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ]
+            }
+
+    def to_prometheus(self, prefix="cricket_scraper", snapshot=None):
+        """Metrics for the current cycle, or a snapshot of an earlier one, in the Prometheus text exposition format"""
+        snapshot = snapshot or self.snapshot()
+        timers = {}
+        for timer in snapshot["timers"]:
+            key = (timer["stage"], label_key(_prometheus_labels(timer["labels"])))
+            total = timers.setdefault(key, {"count": 0, "sum": 0.0, "max": 0.0})
+            total["count"] += timer["count"]
+            total["sum"] += timer["sum"]
+            total["max"] = max(total["max"], timer["max"])
+        counters = {}
+        for counter in snapshot["counters"]:
+            key = (counter["name"], label_key(_prometheus_labels(counter["labels"])))
+            counters[key] = counters.get(key, 0) + counter["value"]
+
+        lines = [
+            f"# TYPE {prefix}_cycle_duration_seconds gauge",
+            f"{prefix}_cycle_duration_seconds {snapshot['duration']:.6f}",
+            f"# TYPE {prefix}_stage_seconds summary"
+        ]
+        for (stage, labels), total in sorted(timers.items()):
+            label_text = _format_labels((("stage", stage),) + labels)
+            lines.append(f"{prefix}_stage_seconds_count{label_text} {total['count']}")
+            lines.append(f"{prefix}_stage_seconds_sum{label_text} {total['sum']:.6f}")
+        lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+        for (stage, labels), total in sorted(timers.items()):
+            lines.append(f"{prefix}_stage_seconds_max{_format_labels((('stage', stage),) + labels)} {total['max']:.6f}")
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{prefix}_{name}_total{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path="metrics.json", prometheus_path="metrics.prom", snapshot=None):
+        """Export the current cycle's metrics, or a snapshot taken earlier, as JSON and Prometheus text files"""
+        snapshot = snapshot or self.snapshot()
+        try:
+            # Replaced atomically so a textfile collector never reads a half-written file
+            with atomic_write(json_path) as f:
+                json.dump(snapshot, f, indent=2)
+            with atomic_write(prometheus_path) as f:
+                f.write(self.to_prometheus(snapshot=snapshot))
+            print(f"Saved metrics to {json_path} and {prometheus_path}")
+        except Exception as e:
+            print(f"Error saving metrics: {e}")
+
+
+def _prometheus_labels(labels):
+    return {k: v for k, v in labels.items() if k not in PROMETHEUS_DROP_LABELS}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide metrics shared by all scrapers
+metrics = Metrics()
@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import metrics
+
+
+class ParsePool:
+    """Worker processes parsing fetched pages on other cores while fetch threads wait on the network
+
+    Jobs return their result along with the metrics recorded in the worker, which are
+    merged into this process's metrics when the result is collected. Workers start from
+    a fork server (spawn where that is unavailable) rather than a fork of this
+    multi-threaded process.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) on a worker process, returning its future"""
+        if self.executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self.executor.submit(run_job, fn, args, kwargs)
+
+    def result(self, future):
+        """Wait for a job and return its result, merging the worker's metrics"""
+        result, snapshot = future.result()
+        metrics.merge(snapshot)
+        return result
+
+    def close(self):
+        """Shut the worker processes down"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_job(fn, args, kwargs):
+    """Worker side of a job: run fn and return its result with the metrics it recorded"""
+    metrics.reset()
+    result = fn(*args, **kwargs)
+    return result, metrics.snapshot()
@@ -0,0 +1,232 @@
+"""Local JSON query API over the history store, with an in-memory response cache
+
+    GET /matches?status=live,complete     match summaries, optionally filtered by scheduler class
+    GET /matches/<id>                     one match summary
+    GET /matches/<id>/scorecard           the match's latest scorecard
+    GET /matches/<id>/deliveries?n=12     the latest n deliveries of the match's latest innings
+
+Responses are read through an LRU cache holding the encoded bytes, so a hot endpoint is
+served without re-reading rows or re-encoding JSON. Each entry expires after a TTL set by
+the state of its match: live matches within seconds, completed matches never. Scorecard
+and delivery entries are also keyed by the stored scorecard's scrape time, which only moves
+when its content changes, and the latest stored ball, one primary-key read per request,
+because the scrapers mark a match complete before they store its final scorecard and
+deliveries.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from full_commentary import format_delivery
+from history_store import HistoryStore
+from scheduler import COMPLETE, INNINGS_BREAK, LIVE, UPCOMING, classify_match
+
+# Seconds a response stays cached, by the state of its match; None keeps it until evicted
+CACHE_TTLS = {
+    LIVE: 5,
+    INNINGS_BREAK: 60,
+    UPCOMING: 300,
+    COMPLETE: None
+}
+# Match lists and unknown matches can change whenever a live match does
+DEFAULT_TTL = CACHE_TTLS[LIVE]
+MAX_DELIVERIES = 120
+
+MATCH_PATH = re.compile(r"^/matches/(\d+)(?:/(scorecard|deliveries))?$")
+
+
+class NotFound(Exception):
+    pass
+
+
+class ResponseCache:
+    """LRU cache of encoded responses with a TTL per entry"""
+
+    def __init__(self, max_entries=1024, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Cached bytes for key, or build() -> (bytes, ttl) stored until the ttl runs out
+
+        Returns (bytes, whether it was a cache hit).
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > self.clock()):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], True
+            self.misses += 1
+
+        body, ttl = build()
+        with self.lock:
+            self.entries[key] = (None if ttl is None else self.clock() + ttl, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return body, False
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def encode(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class QueryAPI:
+    """Builds the API's responses from the history store and caches them"""
+
+    def __init__(self, history, cache=None):
+        self.history = history
+        self.cache = cache or ResponseCache()
+        # The store's connection is shared by the server threads, one query at a time
+        self.lock = threading.Lock()
+
+    def query(self, method, *args):
+        with self.lock:
+            return getattr(self.history, method)(*args)
+
+    def match_state(self, match_id):
+        match = self.query("match", match_id)
+        if match is None:
+            raise NotFound(f"Unknown match {match_id}")
+        return match, classify_match(match)
+
+    def matches(self, statuses=None):
+        def build():
+            listing = []
+            for match_id, match in self.query("matches"):
+                state = classify_match(match)
+                if statuses is None or state in statuses:
+                    listing.append({"match_id": match_id, "state": state, **match})
+            return encode(listing), DEFAULT_TTL
+        key = ("matches", tuple(sorted(statuses)) if statuses else None)
+        return self.cache.get(key, build)
+
+    def match(self, match_id):
+        def build():
+            match, state = self.match_state(match_id)
+            return encode({"match_id": match_id, "state": state, **match}), CACHE_TTLS[state]
+        return self.cache.get(("match", match_id), build)
+
+    def scorecard(self, match_id):
+        def build():
+            _, state = self.match_state(match_id)
+            scorecard = self.query("scorecard", match_id)
+            if scorecard is None:
+                raise NotFound(f"No scorecard for match {match_id}")
+            return encode(scorecard), CACHE_TTLS[state]
+        return self.cache.get(("scorecard", match_id, self.query("scorecard_scraped_at", match_id)), build)
+
+    def deliveries(self, match_id, n=12):
+        def build():
+            _, state = self.match_state(match_id)
+            balls = self.query("latest_deliveries", match_id, n)
+            balls.reverse()
+            return encode({
+                "match_id": match_id,
+                "innings_id": balls[-1].get("inningsId") if balls else None,
+                "latest_over": next((ball["overNumber"] for ball in reversed(balls) if "overNumber" in ball), None),
+                "deliveries": [format_delivery(ball) for ball in balls]
+            }), CACHE_TTLS[state]
+        return self.cache.get(("deliveries", match_id, n, self.query("latest_ball", match_id)), build)
+
+    def route(self, url):
+        """(body, cache hit) for a request URL; raises NotFound or ValueError"""
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        if parts.path == "/matches":
+            statuses = {status for value in query.get("status", []) for status in value.split(",") if status}
+            unknown = statuses - set(CACHE_TTLS)
+            if unknown:
+                raise ValueError(f"Unknown status {sorted(unknown)}, expected some of {sorted(CACHE_TTLS)}")
+            return self.matches(statuses or None)
+
+        match = MATCH_PATH.match(parts.path)
+        if not match:
+            raise NotFound(f"No route for {parts.path}")
+        match_id, resource = int(match.group(1)), match.group(2)
+        if resource == "scorecard":
+            return self.scorecard(match_id)
+        if resource == "deliveries":
+            n = int(query.get("n", ["12"])[0])
+            if not 0 < n <= MAX_DELIVERIES:
+                raise ValueError(f"n must be between 1 and {MAX_DELIVERIES}")
+            return self.deliveries(match_id, n)
+        return self.match(match_id)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Serves the API's routes"""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs stall keep-alive clients
+    disable_nagle_algorithm = True
+    api = None
+
+    def do_GET(self):
+        try:
+            body, hit = self.api.route(self.path)
+            self.send_body(200, body, "HIT" if hit else "MISS")
+        except NotFound as e:
+            self.send_body(404, encode({"error": str(e)}))
+        except ValueError as e:
+            self.send_body(400, encode({"error": str(e)}))
+        except Exception as e:
+            print(f"Error serving {self.path}: {e}")
+            self.send_body(500, encode({"error": "internal error"}))
+
+    def send_body(self, status, body, cache=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if cache:
+            self.send_header("X-Cache", cache)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(api, host="127.0.0.1", port=8766):
+    handler = type("APIHandler", (QueryHandler,), {"api": api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    """Serve the query API over the history store the scrapers write"""
+    parser = argparse.ArgumentParser(description="Serve scraped cricket data as a JSON API")
+    parser.add_argument("--db", default="history.db", help="history store written by the scrapers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--max-entries", type=int, default=1024, help="responses kept in the cache")
+    args = parser.parse_args()
+
+    history = HistoryStore(args.db, shared=True)
+    server = create_server(QueryAPI(history, ResponseCache(args.max_entries)), args.host, args.port)
+    print(f"Serving the query API on http://{args.host}:{args.port}/matches")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping query API...")
+    finally:
+        server.server_close()
+        history.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from metrics import metrics
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header given as delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostBlocked(Exception):
+    """Raised instead of sleeping when a host's backoff outlasts its budget for this cycle"""
+
+    def __init__(self, host, delay):
+        super().__init__(f"{host} is backing off for another {delay:.0f}s")
+        self.host = host
+        self.delay = delay
+
+
+class HostState:
+    __slots__ = ("rate", "next_allowed", "blocked_until", "failures", "waited")
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.next_allowed = 0.0
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.waited = 0.0
+
+
+class AdaptiveRateLimiter:
+    """Per-host AIMD request pacing with jittered exponential backoff
+
+    Every healthy response raises a host's rate by `increase` requests/second up to
+    `max_rate`; a 429, 5xx or transport error multiplies it by `decrease` and blocks the
+    host for a jittered exponential delay, or for the full Retry-After when the server sends
+    a longer one.
+
+    A cycle sleeps through at most `budget` seconds of backoff per host; past that, acquire()
+    raises HostBlocked so the host's remaining requests fail fast and wait for a later cycle.
+    """
+
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=20.0, increase=0.5, decrease=0.5,
+                 base_delay=1.0, max_delay=60.0, budget=30.0):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def _state(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(self.initial_rate)
+        return state
+
+    def new_cycle(self):
+        """Give every host its full backoff budget again"""
+        with self.lock:
+            for state in self.hosts.values():
+                state.waited = 0.0
+
+    def acquire(self, host):
+        """Block until host may be sent another request, or raise HostBlocked"""
+        with self.lock:
+            state = self._state(host)
+            now = time.monotonic()
+            backoff = state.blocked_until - now
+            if backoff > 0:
+                if state.waited + backoff > self.budget:
+                    metrics.incr("deferred", host=host)
+                    raise HostBlocked(host, backoff)
+                state.waited += backoff
+            start = max(now, state.next_allowed, state.blocked_until)
+            state.next_allowed = start + 1.0 / state.rate
+        if start > now:
+            with metrics.timer("sleep", reason="backoff" if backoff > 0 else "rate_limit", host=host):
+                time.sleep(start - now)
+
+    def record(self, host, status_code, retry_after=None):
+        """Feed a response back into host's pacing"""
+        if status_code == 429 or status_code >= 500:
+            self.record_error(host, retry_after=parse_retry_after(retry_after))
+            return
+        with self.lock:
+            state = self._state(host)
+            state.failures = 0
+            state.rate = min(self.max_rate, state.rate + self.increase)
+
+    def record_error(self, host, retry_after=None):
+        """Slow host down and block it for a jittered exponential delay after a failed request"""
+        with self.lock:
+            state = self._state(host)
+            state.failures += 1
+            state.rate = max(self.min_rate, state.rate * self.decrease)
+            delay = min(self.max_delay, self.base_delay * 2 ** (state.failures - 1))
+            delay = random.uniform(delay / 2, delay)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        metrics.incr("throttled", host=host)
+
+    def rate(self, host):
+        """Current requests/second allowed for host"""
+        with self.lock:
+            return self._state(host).rate
+
+
+# Process-wide limiter shared by every fetch
+rate_limiter = AdaptiveRateLimiter()
@@ -0,0 +1,243 @@
+"""Typed records for scraped matches and scorecards
+
+Numbers are parsed once, when a record is built from scraped text, and to_dict() renders
+a record back to the JSON shape the scrapers write. Text that would not render back
+identically from its number (a "-" placeholder, "07", ...) is kept verbatim in `raw`,
+keyed by its JSON field, so the round trip is exact.
+"""
+import re
+from dataclasses import dataclass, field
+
+TOTAL_WICKETS = re.compile(r'\((\d+) wkts?\b')
+LEADING_RUNS = re.compile(r'^(\d+)')
+
+
+def parse_overs(text):
+    """Legal balls in an overs figure written in cricket notation, e.g. "19.3" -> 117"""
+    whole, dot, part = text.partition(".")
+    balls = int(part) if dot else 0
+    if not 0 <= balls < 6:
+        raise ValueError(f"not an overs figure: {text!r}")
+    return int(whole) * 6 + balls
+
+
+def format_overs(balls):
+    return f"{balls // 6}.{balls % 6}" if balls % 6 else str(balls // 6)
+
+
+# (parse, format) pairs for the numeric fields
+INT = (int, str)
+DECIMAL = (float, "{:.2f}".format)
+OVERS = (parse_overs, format_overs)
+
+
+def numbers_from(data, numbers):
+    """Parse the numeric fields of a JSON-shaped dict, returning (values by attribute, raw text by key or None)"""
+    values = {}
+    raw = None
+    for key, attr, (parse, fmt) in numbers:
+        text = data.get(key, "")
+        value = None
+        if text:
+            try:
+                value = parse(text)
+            except ValueError:
+                pass
+            if value is None or fmt(value) != text:
+                raw = raw or {}
+                raw[key] = text
+        values[attr] = value
+    return values, raw
+
+
+def numbers_to(record, out):
+    """Render a record's numeric fields into out, in field order"""
+    raw = record.raw
+    for key, attr, (_, fmt) in record.NUMBERS:
+        if raw and key in raw:
+            out[key] = raw[key]
+        else:
+            value = getattr(record, attr)
+            out[key] = "" if value is None else fmt(value)
+    return out
+
+
+def link_match_id(link):
+    """Cricbuzz match ID in a scorecard or commentary link, or None"""
+    for part in (link or "").split("/"):
+        if part.isdigit() and len(part) > 4:
+            return int(part)
+    return None
+
+
+def leading_int(text):
+    match = LEADING_RUNS.match(text)
+    return int(match.group(1)) if match else None
+
+
+@dataclass(slots=True)
+class Batter:
+    name: str
+    status: str = ""
+    runs: int | None = None
+    balls: int | None = None
+    fours: int | None = None
+    sixes: int | None = None
+    strike_rate: float | None = None
+    raw: dict | None = None
+
+    NUMBERS = (("runs", "runs", INT), ("balls", "balls", INT), ("4s", "fours", INT), ("6s", "sixes", INT),
+               ("strike_rate", "strike_rate", DECIMAL))
+
+    @classmethod
+    def from_dict(cls, data):
+        values, raw = numbers_from(data, cls.NUMBERS)
+        return cls(data.get("name", ""), data.get("status", ""), raw=raw, **values)
+
+    def to_dict(self):
+        return numbers_to(self, {"name": self.name, "status": self.status})
+
+
+@dataclass(slots=True)
+class Bowler:
+    bowler_name: str
+    balls_bowled: int | None = None
+    maiden: int | None = None
+    runs: int | None = None
+    wickets: int | None = None
+    no_balls: int | None = None
+    wide_balls: int | None = None
+    economy: float | None = None
+    raw: dict | None = None
+
+    NUMBERS = (("overs", "balls_bowled", OVERS), ("maiden", "maiden", INT), ("runs", "runs", INT),
+               ("wickets", "wickets", INT), ("no_balls", "no_balls", INT), ("wide_balls", "wide_balls", INT),
+               ("economy", "economy", DECIMAL))
+
+    @classmethod
+    def from_dict(cls, data):
+        values, raw = numbers_from(data, cls.NUMBERS)
+        return cls(data.get("bowler_name", ""), raw=raw, **values)
+
+    def to_dict(self):
+        return numbers_to(self, {"bowler_name": self.bowler_name})
+
+
+@dataclass(slots=True)
+class Innings:
+    innings_name: str
+    batters: list = field(default_factory=list)
+    extras: str = ""
+    total: str = ""
+    yet_to_bat: list = field(default_factory=list)
+    fall_of_wickets: list = field(default_factory=list)
+    bowlers: list = field(default_factory=list)
+    # Parsed from the extras and total text, which are kept as scraped, e.g. "245(8 wkts, 50 Ov)"
+    extras_runs: int | None = field(init=False, default=None)
+    total_runs: int | None = field(init=False, default=None)
+    total_wickets: int | None = field(init=False, default=None)
+
+    def __post_init__(self):
+        self.extras_runs = leading_int(self.extras)
+        self.total_runs = leading_int(self.total)
+        wickets = TOTAL_WICKETS.search(self.total)
+        self.total_wickets = int(wickets.group(1)) if wickets else None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("innings_name", ""),
+            [Batter.from_dict(batter) for batter in data.get("batters", [])],
+            data.get("extras", ""),
+            data.get("total", ""),
+            list(data.get("yet_to_bat", [])),
+            list(data.get("fall_of_wickets", [])),
+            [Bowler.from_dict(bowler) for bowler in data.get("bowlers", [])]
+        )
+
+    def to_dict(self):
+        return {
+            "innings_name": self.innings_name,
+            "batters": [batter.to_dict() for batter in self.batters],
+            "extras": self.extras,
+            "total": self.total,
+            "yet_to_bat": list(self.yet_to_bat),
+            "fall_of_wickets": list(self.fall_of_wickets),
+            "bowlers": [bowler.to_dict() for bowler in self.bowlers]
+        }
+
+
+@dataclass(slots=True)
+class Scorecard:
+    match: str
+    innings: list = field(default_factory=list)
+    # The display name is not unique across series and years; the ID is
+    match_id: int | None = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("match", ""), [Innings.from_dict(innings) for innings in data.get("innings", [])],
+                   data.get("match_id"))
+
+    def to_dict(self):
+        data = {"match": self.match}
+        if self.match_id is not None:
+            data["match_id"] = self.match_id
+        data["innings"] = [innings.to_dict() for innings in self.innings]
+        return data
+
+
+@dataclass(slots=True)
+class Teams:
+    team1: str = ""
+    team2: str = ""
+    score1: str = ""
+    score2: str = ""
+    match_status: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("team1", ""), data.get("team2", ""), data.get("score1", ""), data.get("score2", ""),
+                   data.get("match_status", ""))
+
+    def to_dict(self):
+        return {
+            "team1": self.team1,
+            "team2": self.team2,
+            "score1": self.score1,
+            "score2": self.score2,
+            "match_status": self.match_status
+        }
+
+
+@dataclass(slots=True)
+class Match:
+    match: str = ""
+    status: str = ""
+    date_stadium: str = ""
+    live_score: str = ""
+    scorecard_links: str = ""
+    commentary: str = ""
+    teams: Teams = field(default_factory=Teams)
+
+    @property
+    def match_id(self):
+        """Cricbuzz match ID from the scorecard link, or None"""
+        return link_match_id(self.scorecard_links)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("match", ""), data.get("status", ""), data.get("date_stadium", ""),
+                   data.get("live_score", ""), data.get("scorecard_links", ""), data.get("commentary", ""),
+                   Teams.from_dict(data.get("teams", {})))
+
+    def to_dict(self):
+        return {
+            "match": self.match,
+            "status": self.status,
+            "date_stadium": self.date_stadium,
+            "live_score": self.live_score,
+            "scorecard_links": self.scorecard_links,
+            "commentary": self.commentary,
+            "teams": self.teams.to_dict()
+        }
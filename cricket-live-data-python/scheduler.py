@@ -0,0 +1,149 @@
+import heapq
+import json
+import os
+import re
+import time
+
+from atomic_file import atomic_write
+from snapshot_diff import match_key
+
+LIVE = "live"
+INNINGS_BREAK = "innings_break"
+UPCOMING = "upcoming"
+COMPLETE = "complete"
+
+# Seconds between polls per class; None means freeze after the final fetch
+POLL_INTERVALS = {
+    LIVE: 30,
+    INNINGS_BREAK: 300,
+    UPCOMING: 900,
+    COMPLETE: None
+}
+
+PRIORITY = {LIVE: 0, INNINGS_BREAK: 1, UPCOMING: 2, COMPLETE: 3}
+
+COMPLETE_STATUS = re.compile(r"\b(won by|won the super over|match tied|no result|abandoned|drawn)\b")
+BREAK_STATUS = re.compile(r"\b(innings break|stumps|lunch|tea|dinner|rain stops play|bad light)\b")
+UPCOMING_STATUS = re.compile(r"\b(match starts|starts at|start delayed|toss delayed|preview)\b")
+
+
+def classify_match(match):
+    """Classify a scrape_matches record as live, innings_break, upcoming or complete"""
+    teams = match.get("teams") or {}
+    match_status = teams.get("match_status", "").lower()
+
+    if COMPLETE_STATUS.search(match_status):
+        return COMPLETE
+    if BREAK_STATUS.search(match_status):
+        return INNINGS_BREAK
+    if UPCOMING_STATUS.search(match_status):
+        return UPCOMING
+    if not match_status and not teams.get("score1") and not teams.get("score2"):
+        return UPCOMING
+    return LIVE
+
+
+class MatchScheduler:
+    """Per-match, per-kind polling schedule driven by match status, persisted between runs
+
+    Each kind of fetch ("scorecard", "commentary") has its own due time per match. Live
+    matches are due every POLL_INTERVALS[LIVE] seconds, breaks and upcoming matches less
+    often, and completed matches are frozen once fetched after they finish.
+    """
+
+    def __init__(self, path="schedule_state.json", intervals=None):
+        self.path = path
+        self.intervals = dict(POLL_INTERVALS, **(intervals or {}))
+        self.matches = {}
+        self.queue = []
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding='utf-8') as f:
+                    self.matches = json.load(f)
+            except Exception as e:
+                print(f"Error loading schedule state {path}: {e}")
+        for key, entry in self.matches.items():
+            for kind, due in entry["due"].items():
+                self._push(key, kind, due)
+
+    def _push(self, key, kind, due):
+        if due is not None:
+            heapq.heappush(self.queue, (due, PRIORITY[self.matches[key]["class"]], key, kind))
+
+    def update(self, matches_data, now=None):
+        """Classify every match; new matches and matches whose class changed become due at once
+
+        Matches no longer listed are forgotten, so their due times stop driving next_due().
+        """
+        now = time.time() if now is None else now
+        listed = {match_key(match) for match in matches_data}
+        for key in [key for key in self.matches if key not in listed]:
+            print(f"Match {key} left the live scores, dropping its schedule")
+            del self.matches[key]
+        for match in matches_data:
+            key = match_key(match)
+            match_class = classify_match(match)
+            entry = self.matches.get(key)
+            if entry and entry["class"] == match_class:
+                continue
+            self.matches[key] = {"class": match_class, "due": {"scorecard": now, "commentary": now}}
+            self._push(key, "scorecard", now)
+            self._push(key, "commentary", now)
+            if entry:
+                print(f"Match {key} moved from {entry['class']} to {match_class}")
+
+    def match_class(self, match):
+        entry = self.matches.get(match_key(match))
+        return entry["class"] if entry else classify_match(match)
+
+    def is_due(self, match, kind, now=None):
+        """Whether this kind of fetch is due for match; unknown matches are always due"""
+        now = time.time() if now is None else now
+        entry = self.matches.get(match_key(match))
+        if not entry:
+            return True
+        due = entry["due"].get(kind, now)
+        return due is not None and due <= now
+
+    def mark_fetched(self, match, kind, now=None):
+        """Schedule the next fetch of this kind, freezing matches whose class has no interval"""
+        self._schedule(match, kind, now, freeze=True)
+
+    def mark_failed(self, match, kind, now=None):
+        """Schedule another try of a fetch that failed or came back empty, never freezing the match"""
+        self._schedule(match, kind, now, freeze=False)
+
+    def _schedule(self, match, kind, now, freeze):
+        now = time.time() if now is None else now
+        key = match_key(match)
+        entry = self.matches.setdefault(key, {"class": classify_match(match), "due": {}})
+        interval = self.intervals[entry["class"]]
+        if interval is None and not freeze:
+            interval = self.intervals[LIVE]
+        entry["due"][kind] = None if interval is None else now + interval
+        self._push(key, kind, entry["due"][kind])
+
+    def order(self, matches_data):
+        """Indices of matches_data ordered by class priority, keeping card order within a class"""
+        return sorted(range(len(matches_data)), key=lambda i: PRIORITY[self.match_class(matches_data[i])])
+
+    def next_due(self):
+        """Earliest pending due time across all matches and kinds, or None if everything is frozen"""
+        while self.queue:
+            due, _, key, kind = self.queue[0]
+            entry = self.matches.get(key)
+            if entry and entry["due"].get(kind) == due:
+                return due
+            # Stale entry left behind by a reschedule
+            heapq.heappop(self.queue)
+        return None
+
+    def save(self):
+        """Write the schedule state to disk"""
+        if not self.path:
+            return
+        try:
+            with atomic_write(self.path) as f:
+                json.dump(self.matches, f)
+        except Exception as e:
+            print(f"Error saving schedule state {self.path}: {e}")
@@ -0,0 +1,406 @@
+"""Columnar store of the batting and bowling rows of every scraped scorecard, with leaderboard queries
+
+Rows live in parallel int64 columns (stdlib arrays) keyed by match, innings, team and
+player IDs, with the names dictionary-encoded and matches identified by their Cricbuzz
+match ID. With numpy installed, aggregations run as bincount/lexsort over the columns;
+without it they fall back to plain Python loops.
+"""
+import json
+import os
+import re
+from array import array
+
+from atomic_file import atomic_write
+from records import Scorecard, format_overs
+
+try:
+    import numpy as np
+except ImportError:  # optional: aggregations fall back to Python loops
+    np = None
+
+INNINGS_TEAM = re.compile(r'^(.*?)\s*(?:\d+(?:st|nd|rd|th)\s+)?Innings')
+INNINGS_SCORE = re.compile(r'Innings\s*(\d+)-(\d+)')
+NOT_OUT = ("", "not out", "batting")
+
+BATTING_COLUMNS = ("match", "innings", "team", "player", "runs", "balls", "fours", "sixes", "dismissed")
+BOWLING_COLUMNS = ("match", "innings", "team", "player", "balls", "maidens", "runs", "wickets", "no_balls", "wides")
+INNINGS_COLUMNS = ("match", "innings", "team", "runs", "wickets", "extras")
+# Bumped when the saved layout changes; older files are ignored and the store refills
+STORE_VERSION = 2
+
+
+def innings_team(innings_name):
+    """Batting team of an innings header such as "WIA 2nd Innings251-6 (73 Ov)" """
+    match = INNINGS_TEAM.match(innings_name)
+    return match.group(1) if match else innings_name
+
+
+class Names:
+    """Dictionary encoding of names (or name tuples) to dense integer IDs"""
+
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def id(self, name):
+        """ID of name, adding it when new"""
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def get(self, name):
+        return self.ids.get(name)
+
+
+class Table:
+    """Parallel int64 columns, one row per batting, bowling or innings entry
+
+    The first column is the match. A match's rows are appended together, so they are
+    contiguous and `starts` holds the index of each match's first row.
+    """
+
+    def __init__(self, names, columns=None):
+        self.names = names
+        self.columns = {name: array("q", (columns or {}).get(name, ())) for name in names}
+        self.views = {}
+        self.starts = {}
+        self.index_from(0)
+
+    def __len__(self):
+        return len(self.columns[self.names[0]])
+
+    def index_from(self, start):
+        match = self.columns["match"]
+        for i in range(start, len(match)):
+            self.starts.setdefault(match[i], i)
+
+    def append(self, *values):
+        self.starts.setdefault(values[0], len(self))
+        for name, value in zip(self.names, values):
+            self.columns[name].append(value)
+        self.views = {}
+
+    def drop_matches(self, match_ids):
+        """Remove every row belonging to one of match_ids
+
+        Only the rows from the first dropped match onwards are rewritten. Matches that are
+        replaced every cycle end up at the end of the table, so a cycle touches their rows
+        rather than the whole history.
+        """
+        cut = min((self.starts[match] for match in match_ids if match in self.starts), default=None)
+        if cut is None:
+            return
+        match = self.columns["match"]
+        keep = [i for i in range(cut, len(match)) if match[i] not in match_ids]
+        for name in self.names:
+            column = self.columns[name]
+            tail = array("q", (column[i] for i in keep))
+            del column[cut:]
+            column.extend(tail)
+        self.starts = {match: start for match, start in self.starts.items() if start < cut}
+        self.index_from(cut)
+        self.views = {}
+
+    def column(self, name):
+        """A column as a numpy array when numpy is available, else the stdlib array itself"""
+        if np is None:
+            return self.columns[name]
+        view = self.views.get(name)
+        if view is None:
+            # Copied rather than viewed: an array exporting its buffer cannot grow
+            view = self.views[name] = np.array(self.columns[name], dtype=np.int64)
+        return view
+
+    def to_dict(self):
+        return {name: self.columns[name].tolist() for name in self.names}
+
+
+def group_sum(keys, values, size):
+    """Sum of values for each key in range(size)"""
+    if np is not None:
+        return np.bincount(keys, weights=values, minlength=size).astype(np.int64)
+    totals = [0] * size
+    for key, value in zip(keys, values):
+        totals[key] += value
+    return totals
+
+
+def group_count(keys, size):
+    """Number of rows for each key in range(size)"""
+    if np is not None:
+        return np.bincount(keys, minlength=size)
+    counts = [0] * size
+    for key in keys:
+        counts[key] += 1
+    return counts
+
+
+def group_max(keys, values, size):
+    """Largest value for each key in range(size), -1 where a key has no rows"""
+    if np is not None:
+        highest = np.full(size, -1, dtype=np.int64)
+        np.maximum.at(highest, keys, values)
+        return highest
+    highest = [-1] * size
+    for key, value in zip(keys, values):
+        highest[key] = max(highest[key], value)
+    return highest
+
+
+def ratio(numerators, denominators, scale=1):
+    """scale * numerator / denominator per entry, NaN (None without numpy) where the denominator is 0"""
+    if np is not None:
+        out = np.full(len(numerators), np.nan)
+        np.divide(numerators * float(scale), denominators, out=out, where=denominators > 0)
+        return out
+    return [scale * n / d if d else None for n, d in zip(numerators, denominators)]
+
+
+def rank(keys, n, eligible):
+    """Indices of the first n eligible entries ordered by keys, each ascending, the first key primary"""
+    if np is not None:
+        candidates = np.flatnonzero(eligible)
+        order = np.lexsort(tuple(np.asarray(key)[candidates] for key in reversed(keys)))
+        return candidates[order][:n].tolist()
+    candidates = [i for i, ok in enumerate(eligible) if ok]
+    return sorted(candidates, key=lambda i: tuple(key[i] for key in keys))[:n]
+
+
+def negate(values):
+    return -values if np is not None else [-value for value in values]
+
+
+def at_least(values, minimum):
+    return values >= minimum if np is not None else [value >= minimum for value in values]
+
+
+class ScorecardStore:
+    """Batting, bowling and innings rows of every scorecard scraped so far, persisted between runs
+
+    Matches are keyed by match ID and players by (name, team). Each scrape replaces a
+    match's rows with its latest scorecard; `dirty` is set until the next save().
+    """
+
+    def __init__(self, path="scorecard_store.json"):
+        self.path = path
+        self.clear()
+        self.load()
+
+    def clear(self):
+        self.dirty = False
+        # Last scorecard added per match in the latest update, to skip unchanged ones
+        self.latest = {}
+        self.matches = Names()
+        self.teams = Names()
+        self.players = Names()
+        self.batting = Table(BATTING_COLUMNS)
+        self.bowling = Table(BOWLING_COLUMNS)
+        self.innings = Table(INNINGS_COLUMNS)
+
+    def load(self):
+        """Load the store from disk, starting empty if the file is missing or corrupt"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != STORE_VERSION:
+                print(f"Scorecard store {self.path} has an older layout, starting empty")
+                return
+            self.matches = Names(data["matches"])
+            self.teams = Names(data["teams"])
+            self.players = Names(tuple(player) for player in data["players"])
+            self.batting = Table(BATTING_COLUMNS, data["batting"])
+            self.bowling = Table(BOWLING_COLUMNS, data["bowling"])
+            self.innings = Table(INNINGS_COLUMNS, data["innings"])
+            print(f"Loaded {len(self.batting)} batting and {len(self.bowling)} bowling rows from {self.path}")
+        except Exception as e:
+            print(f"Error loading scorecard store {self.path}: {e}")
+            self.clear()
+
+    def save(self):
+        """Write the store to disk"""
+        if not self.path:
+            return
+        try:
+            data = {
+                "version": STORE_VERSION,
+                "matches": self.matches.names,
+                "teams": self.teams.names,
+                "players": [list(player) for player in self.players.names],
+                "batting": self.batting.to_dict(),
+                "bowling": self.bowling.to_dict(),
+                "innings": self.innings.to_dict()
+            }
+            with atomic_write(self.path) as f:
+                json.dump(data, f, ensure_ascii=False)
+            self.dirty = False
+        except Exception as e:
+            print(f"Error saving scorecard store {self.path}: {e}")
+
+    def update(self, scorecards):
+        """Replace the rows of every match in scorecards (dicts or records.Scorecard) with its latest scorecard
+
+        Scorecards without innings, e.g. failed scrapes, or without a match ID leave the
+        stored rows alone, and so do scorecards identical to the last update's.
+        """
+        records = [sc if isinstance(sc, Scorecard) else Scorecard.from_dict(sc) for sc in scorecards]
+        records = [record for record in records if record.innings and record.match_id is not None]
+        latest, self.latest = self.latest, {record.match_id: record for record in records}
+        records = [record for record in records if latest.get(record.match_id) != record]
+        if not records:
+            return
+        replaced = {self.matches.get(record.match_id) for record in records} - {None}
+        if replaced:
+            for table in (self.batting, self.bowling, self.innings):
+                table.drop_matches(replaced)
+        for record in records:
+            self.add(record)
+        self.dirty = True
+
+    def add(self, record):
+        """Append the rows of one scorecard"""
+        match = self.matches.id(record.match_id)
+        teams = [innings_team(innings.innings_name) for innings in record.innings]
+        # Innings are listed latest first
+        for number, (innings, team) in enumerate(zip(reversed(record.innings), reversed(teams)), 1):
+            batting_team = self.teams.id(team)
+            opponents = set(teams) - {team}
+            bowling_team = self.teams.id(opponents.pop() if len(opponents) == 1 else "")
+
+            runs, wickets = innings.total_runs, innings.total_wickets
+            if runs is None:
+                score = INNINGS_SCORE.search(innings.innings_name)
+                if score:
+                    runs, wickets = int(score.group(1)), int(score.group(2))
+            self.innings.append(match, number, batting_team, runs or 0, wickets or 0, innings.extras_runs or 0)
+
+            for batter in innings.batters:
+                self.batting.append(
+                    match, number, batting_team, self.players.id((batter.name, team)),
+                    batter.runs or 0, batter.balls or 0, batter.fours or 0, batter.sixes or 0,
+                    0 if batter.status.strip() in NOT_OUT else 1
+                )
+            for bowler in innings.bowlers:
+                self.bowling.append(
+                    match, number, bowling_team, self.players.id((bowler.bowler_name, self.teams.names[bowling_team])),
+                    bowler.balls_bowled or 0, bowler.maiden or 0, bowler.runs or 0, bowler.wickets or 0,
+                    bowler.no_balls or 0, bowler.wide_balls or 0
+                )
+
+    def top_run_scorers(self, n=10):
+        """Players with the most runs"""
+        size = len(self.players)
+        player = self.batting.column("player")
+        runs = group_sum(player, self.batting.column("runs"), size)
+        balls = group_sum(player, self.batting.column("balls"), size)
+        innings = group_count(player, size)
+        dismissals = group_sum(player, self.batting.column("dismissed"), size)
+        fours = group_sum(player, self.batting.column("fours"), size)
+        sixes = group_sum(player, self.batting.column("sixes"), size)
+        strike_rates = ratio(runs, balls, 100)
+        averages = ratio(runs, dismissals)
+        return [
+            {
+                "player": self.players.names[i][0],
+                "team": self.players.names[i][1],
+                "innings": int(innings[i]),
+                "runs": int(runs[i]),
+                "balls": int(balls[i]),
+                "4s": int(fours[i]),
+                "6s": int(sixes[i]),
+                "strike_rate": rounded(strike_rates[i]),
+                "average": rounded(averages[i])
+            }
+            for i in rank([negate(runs), balls], n, at_least(innings, 1))
+        ]
+
+    def bowling_figures(self):
+        size = len(self.players)
+        player = self.bowling.column("player")
+        return (
+            group_sum(player, self.bowling.column("balls"), size),
+            group_sum(player, self.bowling.column("runs"), size),
+            group_sum(player, self.bowling.column("wickets"), size),
+            group_sum(player, self.bowling.column("maidens"), size)
+        )
+
+    def bowling_row(self, i, balls, runs, wickets, maidens, economies):
+        return {
+            "player": self.players.names[i][0],
+            "team": self.players.names[i][1],
+            "overs": format_overs(int(balls[i])),
+            "maidens": int(maidens[i]),
+            "runs": int(runs[i]),
+            "wickets": int(wickets[i]),
+            "economy": rounded(economies[i])
+        }
+
+    def top_wicket_takers(self, n=10):
+        """Players with the most wickets, fewest runs conceded first on a tie"""
+        balls, runs, wickets, maidens = self.bowling_figures()
+        economies = ratio(runs, balls, 6)
+        order = rank([negate(wickets), runs], n, at_least(balls, 1))
+        return [self.bowling_row(i, balls, runs, wickets, maidens, economies) for i in order]
+
+    def economy_leaders(self, n=10, min_balls=30):
+        """Players with the lowest economy rate among those who bowled at least min_balls"""
+        balls, runs, wickets, maidens = self.bowling_figures()
+        economies = ratio(runs, balls, 6)
+        order = rank([economies, negate(balls)], n, at_least(balls, max(min_balls, 1)))
+        return [self.bowling_row(i, balls, runs, wickets, maidens, economies) for i in order]
+
+    def team_totals(self):
+        """Innings played, runs, wickets lost, highest total and average per innings for each team"""
+        size = len(self.teams)
+        team = self.innings.column("team")
+        innings = group_count(team, size)
+        runs = group_sum(team, self.innings.column("runs"), size)
+        wickets = group_sum(team, self.innings.column("wickets"), size)
+        highest = group_max(team, self.innings.column("runs"), size)
+        averages = ratio(runs, innings)
+        return [
+            {
+                "team": self.teams.names[i],
+                "innings": int(innings[i]),
+                "runs": int(runs[i]),
+                "wickets": int(wickets[i]),
+                "highest": int(highest[i]),
+                "average": rounded(averages[i])
+            }
+            for i in rank([negate(runs)], size, at_least(innings, 1))
+        ]
+
+    def leaderboards(self, n=10):
+        """Every leaderboard, as served to clients"""
+        return {
+            "run_scorers": self.top_run_scorers(n),
+            "wicket_takers": self.top_wicket_takers(n),
+            "economy": self.economy_leaders(n),
+            "team_totals": self.team_totals()
+        }
+
+
+def rounded(value, digits=2):
+    """value rounded for output, None for a missing (None or NaN) ratio"""
+    return None if value is None or value != value else round(float(value), digits)
+
+
+def main():
+    """Load scorecard.json into the store and print the leaderboards"""
+    store = ScorecardStore()
+    try:
+        with open("scorecard.json", "r", encoding='utf-8') as f:
+            store.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading scorecard.json: {e}")
+    store.save()
+    print(json.dumps(store.leaderboards(), indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import json
+import os
+
+from atomic_file import atomic_write
+
+# List fields whose items are matched by an identity field rather than by position
+LIST_KEYS = {
+    "innings": "innings_name",
+    "batters": "name",
+    "bowlers": "bowler_name"
+}
+
+
+def match_key(record):
+    """Identity of a top-level record in matches.json, scorecard.json or full_commentary.json
+
+    Scorecard and commentary records carry their match ID; display names are not unique.
+    """
+    return record.get("match_id") or record.get("scorecard_links") or record.get("match", "")
+
+
+def item_key(field, item):
+    if field is None:
+        return match_key(item)
+    return item.get(LIST_KEYS[field], "")
+
+
+def diff_snapshots(old, new):
+    """Compute a patch turning snapshot `old` into `new`
+
+    Each op is {"op": "add" | "remove" | "replace", "path": [...], "value": ...}. Path
+    segments inside matches, innings, batters and bowlers are the item's identity
+    (match ID, link or name, innings name, player name) rather than a list index.
+    """
+    ops = []
+    _diff_keyed_list(None, old or [], new or [], [], ops)
+    return ops
+
+
+def _diff(old, new, path, ops):
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": path + [key], "value": value})
+            else:
+                _diff(old[key], value, path + [key], ops)
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": path + [key]})
+    elif isinstance(old, list) and isinstance(new, list) and path and path[-1] in LIST_KEYS:
+        _diff_keyed_list(path[-1], old, new, path, ops)
+    else:
+        ops.append({"op": "replace", "path": path, "value": new})
+
+
+def _diff_keyed_list(field, old, new, path, ops):
+    if not all(isinstance(item, dict) for item in old + new):
+        ops.append({"op": "replace", "path": path, "value": new})
+        return
+
+    old_keys = [item_key(field, item) for item in old]
+    new_keys = [item_key(field, item) for item in new]
+    kept = [key for key in old_keys if key in new_keys]
+
+    # Patch per item only when identities are unique and surviving items keep their order
+    # with additions at the end; anything else is cheaper to send as a whole list
+    if (len(set(old_keys)) != len(old_keys) or len(set(new_keys)) != len(new_keys)
+            or new_keys[:len(kept)] != kept):
+        ops.append({"op": "replace", "path": path, "value": new})
+        return
+
+    old_items = dict(zip(old_keys, old))
+    for key in old_keys:
+        if key not in new_keys:
+            ops.append({"op": "remove", "path": path + [key]})
+    for key, item in zip(new_keys, new):
+        if key in old_items:
+            _diff(old_items[key], item, path + [key], ops)
+        else:
+            ops.append({"op": "add", "path": path + [key], "value": item})
+
+
+def apply_patch(snapshot, ops):
+    """Apply ops produced by diff_snapshots to a copy of snapshot and return it"""
+    result = json.loads(json.dumps(snapshot or []))
+    for op in ops:
+        path = op["path"]
+        if not path:
+            result = op["value"]
+            continue
+        parent, field = _resolve(result, path[:-1])
+        _apply(parent, field, path[-1], op)
+    return result
+
+
+def _resolve(node, path):
+    """Walk path from node, returning the container reached and the list field it came from"""
+    field = None
+    for segment in path:
+        if isinstance(node, list):
+            node = next(item for item in node if item_key(field, item) == segment)
+            field = None
+        else:
+            node = node[segment]
+            field = segment
+    return node, field
+
+
+def _apply(parent, field, segment, op):
+    if isinstance(parent, list):
+        index = next((i for i, item in enumerate(parent) if item_key(field, item) == segment), None)
+        if op["op"] == "remove":
+            del parent[index]
+        elif op["op"] == "add":
+            parent.append(op["value"])
+        else:
+            parent[index] = op["value"]
+    elif op["op"] == "remove":
+        del parent[segment]
+    else:
+        parent[segment] = op["value"]
+
+
+def patch_path(path):
+    """Patch file written next to a snapshot, e.g. scorecard.json -> scorecard.patch.json"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.patch{ext}"
+
+
+def write_patch(path, new):
+    """Diff new against the snapshot currently at path and write the patch beside it"""
+    old = []
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding='utf-8') as f:
+                old = json.load(f)
+        except Exception as e:
+            print(f"Error loading previous snapshot {path}: {e}")
+
+    ops = diff_snapshots(old, new)
+    try:
+        with atomic_write(patch_path(path)) as f:
+            json.dump(ops, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"Saved {len(ops)} changes to {patch_path(path)}")
+    except Exception as e:
+        print(f"Error saving patch for {path}: {e}")
+    return ops
@@ -0,0 +1,198 @@
+"""Background writer for the snapshot files, with a generation manifest for readers
+
+The daemon hands each cycle's outputs to SnapshotWriter.write_set() and goes back to
+scraping while a background thread writes them: each file's patch, the file itself
+(temp file, fsync, rename) and, when enabled, its binary snapshot. At most one set waits
+behind the one being written; a newer set is merged over it, so a slow disk never builds
+a queue of stale cycles.
+
+snapshot_manifest.json tells readers which generation is on disk:
+
+    {"generation": 12, "writing": false, "written_at": 1718000000.0,
+     "files": {"matches.json": 12, "scorecard.json": 12, "full_commentary.json": 12,
+               "scorecard.snapshot": 12, ...}}
+
+It is rewritten with "writing": true before a set's files are replaced and with the new
+generation and "writing": false after. "files" holds the generation each file was last
+written at, binary snapshots included; a file whose write failed keeps its older entry.
+A reader that sees every file it wants at the manifest's generation, not writing, and the
+same manifest before and after reading them has read one consistent set; see
+read_consistent(). Binary snapshots also carry their generation in their header; see
+open_snapshot().
+
+matches_scorecard.py and full_commentary.py write through SnapshotWriter as well. The
+commentary script joins the generation of the matches.json it read rather than starting
+a new one, since its output belongs to that set. One process writes a manifest at a time.
+"""
+import json
+import os
+import threading
+import time
+
+from atomic_file import atomic_write
+from binary_snapshot import SnapshotReader, snapshot_path, write_snapshot
+from metrics import metrics
+from snapshot_diff import write_patch
+
+MANIFEST_PATH = "snapshot_manifest.json"
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """The manifest at path, or generation 0 when there is none yet"""
+    manifest = {"generation": 0, "writing": False, "written_at": None, "files": {}}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding='utf-8') as f:
+                manifest.update(json.load(f))
+        except Exception as e:
+            print(f"Error loading snapshot manifest {path}: {e}")
+    return manifest
+
+
+class SnapshotWriter:
+    """Writes sets of snapshot files on a background thread, one generation per set"""
+
+    def __init__(self, manifest_path=MANIFEST_PATH, binary=False):
+        self.manifest_path = manifest_path
+        self.binary = binary
+        self.manifest = load_manifest(manifest_path)
+        self.generation = self.manifest["generation"]
+        if self.manifest["writing"]:
+            # A writer died mid-set; its files carry their older generations, so readers can go on
+            print(f"Snapshot generation {self.generation} was left half written, clearing the flag")
+            self.manifest["writing"] = False
+            self.save_manifest()
+        self.cond = threading.Condition()
+        self.pending = None
+        self.busy = False
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="snapshot-writer", daemon=True)
+        self.thread.start()
+
+    def write_set(self, files, generation=None, cycle_metrics=None):
+        """Queue {path: snapshot data} as the next generation and return its number
+
+        With generation, the files join that existing generation instead, e.g. commentary
+        derived from the matches.json written at it. cycle_metrics, a metrics snapshot, is
+        exported once the set is on disk. The data must not be modified afterwards; the
+        daemon builds fresh lists each cycle.
+        """
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("Snapshot writer is closed")
+            if generation is None:
+                self.generation += 1
+                generation = self.generation
+            if self.pending is not None:
+                print(f"Snapshot generation {self.pending[0]} superseded by {generation} before it was written")
+                metrics.incr("snapshots_superseded")
+                files = {**self.pending[1], **files}
+            self.pending = (generation, files, cycle_metrics)
+            self.cond.notify_all()
+            return generation
+
+    def run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending is not None or self.closed)
+                if self.pending is None:
+                    return
+                generation, files, cycle_metrics = self.pending
+                self.pending = None
+                self.busy = True
+            try:
+                self.write(generation, files)
+                if cycle_metrics is not None:
+                    metrics.write(snapshot=cycle_metrics)
+            except Exception as e:
+                print(f"Error writing snapshot generation {generation}: {e}")
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def write(self, generation, files):
+        """Write one set of files and publish its generation in the manifest"""
+        with metrics.timer("snapshot_write", files=len(files)):
+            self.manifest["writing"] = True
+            self.save_manifest()
+            for path, data in files.items():
+                try:
+                    write_patch(path, data)
+                    with metrics.timer("serialize", file=path), atomic_write(path) as f:
+                        json.dump(data, f, indent=2, ensure_ascii=False)
+                    self.manifest["files"][path] = generation
+                    print(f"Saved {len(data)} records to {path}")
+                except Exception as e:
+                    print(f"Error saving {path}: {e}")
+                    continue
+                if self.binary:
+                    try:
+                        with metrics.timer("serialize", file=snapshot_path(path)):
+                            write_snapshot(snapshot_path(path), data, generation=generation)
+                        self.manifest["files"][snapshot_path(path)] = generation
+                    except Exception as e:
+                        print(f"Error saving {snapshot_path(path)}: {e}")
+            self.manifest.update(generation=max(generation, self.manifest["generation"]), writing=False,
+                                 written_at=time.time())
+            self.save_manifest()
+
+    def save_manifest(self):
+        with atomic_write(self.manifest_path) as f:
+            json.dump(self.manifest, f)
+
+    def flush(self):
+        """Block until every queued set is on disk"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.pending is None and not self.busy)
+
+    def close(self):
+        """Write what is queued and stop the background thread"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+
+
+def read_consistent(paths, manifest_path=MANIFEST_PATH, attempts=10, delay=0.05):
+    """Read JSON snapshots from one generation, returning (generation, {path: data})
+
+    Retries while a set is being written or any of paths is not at the manifest's
+    generation; returns (None, {}) if no consistent read succeeded within attempts.
+    """
+    for _ in range(attempts):
+        before = load_manifest(manifest_path)
+        generation = before["generation"]
+        if not before["writing"] and all(before["files"].get(path) == generation for path in paths):
+            try:
+                data = {}
+                for path in paths:
+                    with open(path, "r", encoding='utf-8') as f:
+                        data[path] = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading snapshots: {e}")
+            else:
+                if load_manifest(manifest_path) == before:
+                    return generation, data
+        time.sleep(delay)
+    print(f"No consistent snapshot set after {attempts} attempts")
+    return None, {}
+
+
+def open_snapshot(path, manifest_path=MANIFEST_PATH):
+    """SnapshotReader for a binary snapshot of the manifest's current generation, or None
+
+    A snapshot whose last write failed keeps an older generation in both its header and
+    the manifest, and is refused rather than served next to newer JSON files.
+    """
+    manifest = load_manifest(manifest_path)
+    generation = manifest["generation"]
+    if manifest["writing"] or manifest["files"].get(path) != generation:
+        print(f"{path} is not at snapshot generation {generation}")
+        return None
+    reader = SnapshotReader(path)
+    if reader.generation != generation:
+        print(f"{path} holds generation {reader.generation}, not {generation}")
+        reader.close()
+        return None
+    return reader